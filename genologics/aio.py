@@ -0,0 +1,350 @@
+"""Python interface to GenoLogics LIMS via its REST API.
+
+Asynchronous LIMS interface, for use from asyncio code.
+
+Requires Python 3.6 or later and the aiohttp package.
+"""
+
+import asyncio
+import time
+
+import aiohttp
+import requests
+
+from genologics.constants import nsmap
+from genologics.etree import ElementTree
+from genologics.lims import Lims, TIMEOUT
+from genologics.transport import IDEMPOTENT_METHODS
+
+MAX_CONNECTIONS = 100
+
+
+class AsyncResponse(object):
+    """The parts of an aiohttp response used by Lims.validate_response,
+    mimicking a requests.Response."""
+
+    def __init__(self, status_code, content, url, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError("%s Error for url: %s" % (self.status_code, self.url),
+                                                response=self)
+
+
+class AsyncListing(object):
+    """Instances of a list resource, returned by the iter_* methods of AsyncLims.
+
+    Iterate with 'async for' to fetch the pages without blocking the event
+    loop, or with a plain 'for' to fetch them with blocking requests.
+    'await listing.collect()' returns all the instances as a list.
+    """
+
+    def __init__(self, lims, klass, add_info, params):
+        self.lims = lims
+        self.klass = klass
+        self.add_info = add_info
+        self.params = params
+
+    def __iter__(self):
+        return Lims._iter_instances(self.lims, self.klass, add_info=self.add_info, params=self.params)
+
+    async def __aiter__(self):
+        tag = self.klass._TAG
+        if tag is None:
+            tag = self.klass.__name__.lower()
+        uri = self.lims.get_uri(self.klass._URI)
+        queries = self.lims._split_params(uri, self.params)
+        if len(queries) == 1:
+            roots = self.lims.aiter_pages(uri, self.params)
+            seen = None
+        else:
+            roots = self.lims.aiter_pages_split(uri, queries)
+            seen = set()
+        async for root in roots:
+            for node in root.findall(tag):
+                if seen is not None:
+                    if node.attrib['uri'] in seen: continue
+                    seen.add(node.attrib['uri'])
+                instance = self.klass(self.lims, uri=node.attrib['uri'])
+                if self.add_info:
+                    info_dict = {}
+                    for attrib_key in node.attrib:
+                        info_dict[attrib_key] = node.attrib['uri']
+                    for subnode in node:
+                        info_dict[subnode.tag] = subnode.text
+                    yield instance, info_dict
+                else:
+                    yield instance
+
+    async def collect(self):
+        "Return the list of instances, and of info dictionaries if add_info is true."
+        results = [item async for item in self]
+        if self.add_info:
+            return [r[0] for r in results], [r[1] for r in results]
+        return results
+
+
+class AsyncLims(Lims):
+    """LIMS interface with awaitable requests, built on aiohttp.
+
+    It uses the same entity classes as Lims. Their XML data is loaded with
+    'await entity.aget()', 'await lims.aget_batch(...)' or
+    'await lims.aresolve(...)', after which the descriptors read it without
+    any request. The iter_* list methods return AsyncListing objects that
+    page through the results with 'async for'.
+
+    The limits given to the constructor apply to the asynchronous requests
+    too: their rate is awaited with asyncio.sleep() and their max_in_flight
+    with an asyncio.Semaphore, so waiting never blocks the event loop.
+
+    All the blocking methods of Lims remain available. The aiohttp session
+    is created on first use and must be closed with 'await lims.close()',
+    or by using the instance as an async context manager.
+    """
+
+    def __init__(self, baseuri, username, password, max_connections=MAX_CONNECTIONS, **kwargs):
+        """max_connections: The maximum number of simultaneous connections
+                            to the server.
+        See Lims for the other arguments.
+        """
+        super(AsyncLims, self).__init__(baseuri, username, password, **kwargs)
+        self.max_connections = max_connections
+        self._session = None
+        self._semaphores = dict()
+        self._semaphores_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.max_connections),
+                    auth=aiohttp.BasicAuth(self.username, self.password),
+                    timeout=aiohttp.ClientTimeout(sock_connect=TIMEOUT, sock_read=TIMEOUT))
+        return self._session
+
+    async def close(self):
+        "Close the aiohttp session."
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, uri, params=None, data=None, headers=None, retry=None):
+        """Send a HTTP request, retrying transient failures according to the
+        retry policy; by default only idempotent methods are retried."""
+        query = []
+        for key, value in (params or {}).items():
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                query.append((key, str(item)))
+        if retry is None:
+            retry = method.lower() in IDEMPOTENT_METHODS
+        policy = self.retry_policy
+        policy.request_sent()
+        attempt = 0
+        while True:
+            response = None
+            held = await self._acquire_limits(method.lower(), uri)
+            try:
+                response = await self._send(method, uri, query, data, headers)
+            except requests.exceptions.RequestException as e:
+                if not (retry and policy.retry(attempt, exception=e)):
+                    raise
+            else:
+                if not (retry and policy.retry(attempt, response=response)):
+                    return response
+            finally:
+                self._release_limits(held)
+            await asyncio.sleep(policy.delay(attempt, response))
+            attempt += 1
+
+    def _semaphore(self, limit):
+        "Return the asyncio.Semaphore enforcing the max_in_flight of limit."
+        loop = asyncio.get_event_loop()
+        if self._semaphores_loop is not loop:
+            self._semaphores = dict()
+            self._semaphores_loop = loop
+        semaphore = self._semaphores.get(limit)
+        if semaphore is None:
+            semaphore = self._semaphores[limit] = asyncio.Semaphore(limit.max_in_flight)
+        return semaphore
+
+    async def _acquire_limits(self, method, uri):
+        """Wait for the limits of a request without blocking the event loop.
+        Return the list of limits held, to give back to _release_limits()."""
+        acquired = []
+        try:
+            waited = 0
+            for limit in self.governor.matching(method, uri):
+                start = time.time()
+                if limit.max_in_flight:
+                    await self._semaphore(limit).acquire()
+                acquired.append(limit)
+                delay = limit.reserve()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                waited += limit.record(time.time() - start)
+        except BaseException:
+            self._release_limits(acquired)
+            raise
+        self.governor.add_wait(waited)
+        return acquired
+
+    def _release_limits(self, acquired):
+        for limit in reversed(acquired):
+            if limit.max_in_flight:
+                self._semaphore(limit).release()
+
+    async def _send(self, method, uri, query, data, headers):
+        try:
+            async with self._get_session().request(method, uri, params=query, data=data,
+                                                   headers=headers) as r:
+                return AsyncResponse(r.status, await r.read(), uri, headers=r.headers)
+        except asyncio.TimeoutError:
+            raise requests.exceptions.Timeout("Timeout, Error trying to reach {0}".format(uri))
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError("{0}, Error trying to reach {1}".format(e, uri))
+
+    async def aget(self, uri, params=dict()):
+        "GET data from the URI. Return the response XML as an ElementTree."
+        r = await self._request('GET', uri, params=params,
+                                headers=dict(accept='application/xml'))
+        return self.parse_response(r)
+
+    async def aput(self, uri, data, params=dict()):
+        "PUT the serialized XML to the given URI."
+        r = await self._request('PUT', uri, params=params, data=data,
+                                headers={'content-type': 'application/xml',
+                                         'accept': 'application/xml'})
+        self.validate_response(r)
+
+    async def apost(self, uri, data, params=dict(), retry=False):
+        """POST the serialized XML to the given URI.
+        Return the response XML as an ElementTree.
+        retry: Whether transient failures are retried; see Lims.post.
+        """
+        r = await self._request('POST', uri, params=params, data=data, retry=retry,
+                                headers={'content-type': 'application/xml',
+                                         'accept': 'application/xml'})
+        return self.parse_response(r, accept_status_codes=[200, 201, 202])
+
+    async def adelete(self, uri):
+        "Issue a HTTP DELETE request."
+        r = await self._request('DELETE', uri)
+        if not r.status_code == 204:
+            raise requests.exceptions.HTTPError(str(r.content))
+
+    async def aget_entity(self, entity, force=False):
+        """Get the XML data of the entity, unless it is already loaded and
+        either not expired or modified locally. Return the entity."""
+        if not force and entity.root is not None and (entity._dirty or not self.cache.expired(entity)):
+            self.cache.touch(entity)
+            return entity
+        if not force and entity.root is None and self.persistent_cache is not None:
+            root = self.persistent_cache.load(entity)
+            if root is not None:
+                entity.root = root
+                return entity
+        entity.root = await self.aget(entity.uri)
+        if self.persistent_cache is not None:
+            self.persistent_cache.store(entity)
+        return entity
+
+    async def aiter_pages(self, uri, params=dict()):
+        """Yield the XML root of each page of a list resource.
+        Only the requested page is fetched if params has a start-index."""
+        root = await self.aget(uri, params=params)
+        while True:
+            yield root
+            if params.get('start-index') is not None: break
+            node = root.find('next-page')
+            if node is None: break
+            root = await self.aget(node.attrib['uri'], params=params)
+
+    async def aiter_pages_split(self, uri, queries):
+        """Yield the pages of several queries of a list resource, query after
+        query. The queries are sent concurrently, each up to prefetch_pages
+        (at least one) pages ahead of the caller."""
+        depth = self.prefetch_pages or 1
+
+        async def fetch(params, pages):
+            try:
+                async for root in self.aiter_pages(uri, params):
+                    await pages.put((root, None))
+            except Exception as e:
+                await pages.put((None, e))
+            else:
+                await pages.put((None, None))
+
+        readers = []
+        for params in queries:
+            pages = asyncio.Queue(maxsize=depth)
+            readers.append((pages, asyncio.ensure_future(fetch(params, pages))))
+        try:
+            for pages, task in readers:
+                while True:
+                    root, error = await pages.get()
+                    if error is not None:
+                        raise error
+                    if root is None:
+                        break
+                    yield root
+        finally:
+            for pages, task in readers:
+                task.cancel()
+
+    def _iter_instances(self, klass, add_info=None, params=dict()):
+        return AsyncListing(self, klass, add_info, params)
+
+    async def aget_batch(self, instances, force=False, chunk_size=None):
+        """Get the content of a set of instances using the batch call; see
+        Lims.get_batch. The chunks are sent concurrently."""
+        if not instances:
+            return []
+        links = []
+        instance_map = {}
+        for instance in instances:
+            instance_map[instance.id] = instance
+            if force or instance.root is None:
+                links.append(instance)
+
+        if links:
+            uri = self.get_uri(instance.__class__._URI, 'batch/retrieve')
+            requests_ = []
+            for chunk in self._chunks(links, chunk_size):
+                root = ElementTree.Element(nsmap('ri:links'))
+                for instance in chunk:
+                    ElementTree.SubElement(root, 'link', dict(uri=instance.uri,
+                                                              rel=instance.__class__._URI))
+                requests_.append(self.apost(uri, self.tostring(ElementTree.ElementTree(root)),
+                                            retry=True))
+            for root in await asyncio.gather(*requests_):
+                for node in root:
+                    instance = instance_map[node.attrib['limsid']]
+                    instance.root = node
+        return instance_map.values()
+
+    async def aresolve(self, instances, force=False):
+        """Get the content of a list of instances of any classes in bulk; see
+        Lims.resolve. All requests are sent concurrently."""
+        unique = {}
+        for instance in instances:
+            unique.setdefault((instance.__class__, instance.uri), instance)
+        groups = {}
+        for (klass, uri), instance in unique.items():
+            groups.setdefault(klass, []).append(instance)
+        requests_ = []
+        for klass, group in groups.items():
+            if klass._BATCH:
+                requests_.append(self.aget_batch(group, force=force))
+            else:
+                requests_.extend(self.aget_entity(instance, force=force) for instance in group)
+        await asyncio.gather(*requests_)
+        return list(unique.values())
@@ -0,0 +1,334 @@
+"""Python interface to GenoLogics LIMS via its REST API.
+
+Caches holding the entity instances created through a LIMS interface.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+from genologics.etree import ElementTree
+
+CACHE_N_ENTRIES = 10000
+CACHE_N_ELEMENTS = 1000000
+
+
+def _move_to_end(ordered_dict, key):
+    "Mark key as most recently used; OrderedDict.move_to_end is Python 3 only."
+    try:
+        ordered_dict.move_to_end(key)
+    except AttributeError:
+        ordered_dict[key] = ordered_dict.pop(key)
+
+
+class BaseEntityCache(MutableMapping):
+    """Mapping from URI to entity instance, with the expiry policy shared by
+    the entity caches. keys(), values() and items() return lists, so the
+    cache can be changed while they are iterated over, and do not count as
+    lookups.
+
+    ttl: dictionary from entity class to the number of seconds the XML of its
+         instances is used before Entity.get() revalidates it with the server;
+         None means it never expires. XML modified locally is not revalidated
+         until it is saved with put(), so that unsaved changes are not lost.
+    default_ttl: the time to live of classes missing from ttl.
+    """
+
+    def __init__(self, ttl=None, default_ttl=None):
+        self.ttl = dict(ttl or {})
+        self.default_ttl = default_ttl
+
+    def expires(self, klass):
+        "Return True if instances of klass have a time to live."
+        return self.ttl.get(klass, self.default_ttl) is not None
+
+    def expired(self, entity):
+        "Return True if the XML of entity is older than its time to live."
+        ttl = self.ttl.get(entity.__class__, self.default_ttl)
+        return ttl is not None and time.time() - entity._loaded_at > ttl
+
+    def get(self, uri, default=None):
+        try:
+            return self[uri]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def root_loaded(self, entity):
+        "Called by an entity when its XML root has been assigned."
+        pass
+
+    def touch(self, entity):
+        "Called by an entity when its XML root is used."
+        pass
+
+
+class EntityCache(BaseEntityCache):
+    """Least recently used map from URI to entity instance.
+
+    Insertion, lookup and eviction are all O(1). A successful lookup
+    refreshes the entry, so the entry evicted once the capacity is
+    exceeded is always the one that was least recently created or used.
+    """
+
+    def __init__(self, capacity=CACHE_N_ENTRIES, ttl=None, default_ttl=None):
+        super(EntityCache, self).__init__(ttl, default_ttl)
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, uri):
+        try:
+            entity = self._entries.pop(uri)
+        except KeyError:
+            self.misses += 1
+            raise
+        self._entries[uri] = entity
+        self.hits += 1
+        return entity
+
+    def __setitem__(self, uri, entity):
+        self._entries.pop(uri, None)
+        self._entries[uri] = entity
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __delitem__(self, uri):
+        del self._entries[uri]
+
+    def __contains__(self, uri):
+        return uri in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def pop(self, uri, default=None):
+        return self._entries.pop(uri, default)
+
+    def keys(self):
+        return list(self._entries.keys())
+
+    def values(self):
+        return list(self._entries.values())
+
+    def items(self):
+        return list(self._entries.items())
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def stats(self):
+        "Return the hit, miss and eviction counters as a dictionary."
+        return dict(size=len(self._entries), capacity=self.capacity,
+                    hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+
+class WeakEntityCache(BaseEntityCache):
+    """Identity map from URI to entity instance with a bounded XML footprint.
+
+    Entities are held through weak references, so an entity stays the unique
+    instance for its URI for as long as anything refers to it. What is bounded
+    is the total number of XML elements in the cached roots: once max_elements
+    is exceeded, the roots of the least recently used entities are dropped and
+    fetched again by Entity.get() on their next use. Roots modified through
+    the descriptors since they were loaded are kept, and count towards
+    max_elements, until they are saved with put() or put_batch().
+    """
+
+    def __init__(self, max_elements=CACHE_N_ELEMENTS, ttl=None, default_ttl=None):
+        super(WeakEntityCache, self).__init__(ttl, default_ttl)
+        self.max_elements = max_elements
+        self.n_elements = 0
+        self._entities = weakref.WeakValueDictionary()
+        self._roots = OrderedDict()  # uri -> (weakref to entity, element count)
+        self._released = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, uri):
+        try:
+            entity = self._entities[uri]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        return entity
+
+    def __setitem__(self, uri, entity):
+        self._entities[uri] = entity
+
+    def __delitem__(self, uri):
+        del self._entities[uri]
+        self._forget(uri)
+
+    def __contains__(self, uri):
+        return uri in self._entities
+
+    def __len__(self):
+        return len(self._entities)
+
+    def pop(self, uri, default=None):
+        self._forget(uri)
+        return self._entities.pop(uri, default)
+
+    def keys(self):
+        return list(self._entities.keys())
+
+    def values(self):
+        return list(self._entities.values())
+
+    def items(self):
+        return list(self._entities.items())
+
+    def clear(self):
+        self._entities.clear()
+        self._roots.clear()
+        self.n_elements = 0
+
+    def root_loaded(self, entity):
+        "Account for the new root of entity, dropping old roots over budget."
+        with self._lock:
+            self._root_loaded(entity)
+
+    def _root_loaded(self, entity):
+        self._purge()
+        uri = entity.uri
+        if self._entities.get(uri) is not entity:
+            return  # not created through the cache, e.g. a new entity
+        self._forget(uri)
+        size = sum(1 for _ in entity._root.iter())
+        released = self._released
+        ref = weakref.ref(entity, lambda ref: released.append((uri, ref)))
+        self._roots[uri] = (ref, size)
+        self.n_elements += size
+        dirty = []
+        while self.n_elements > self.max_elements and len(self._roots) > 1:
+            old_uri, item = self._roots.popitem(last=False)
+            ref, size = item
+            old = ref()
+            if old is not None and old._dirty:
+                dirty.append((old_uri, item))
+                continue
+            self.n_elements -= size
+            if old is not None:
+                old._root = None
+                old._index = None
+                old._views = None
+                self.evictions += 1
+        for old_uri, item in dirty:
+            self._roots[old_uri] = item
+
+    def touch(self, entity):
+        with self._lock:
+            if entity.uri in self._roots:
+                _move_to_end(self._roots, entity.uri)
+
+    def _forget(self, uri):
+        item = self._roots.pop(uri, None)
+        if item is not None:
+            self.n_elements -= item[1]
+
+    def _purge(self):
+        "Stop accounting for the roots of entities that were garbage collected."
+        while self._released:
+            uri, ref = self._released.pop()
+            item = self._roots.get(uri)
+            if item is not None and item[0] is ref:
+                self._forget(uri)
+
+    @property
+    def stats(self):
+        "Return the cache size and counters as a dictionary."
+        self._purge()
+        return dict(size=len(self._entities), roots=len(self._roots),
+                    elements=self.n_elements, max_elements=self.max_elements,
+                    hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+
+class DiskCache(object):
+    """Persistent cache of entity XML shared between processes.
+
+    Each entity is stored as a gzip compressed XML file named after a hash of
+    its URI. Files are written to a temporary name and renamed into place, so
+    concurrent readers and writers always see complete files.
+
+    directory: Directory holding the cache files; created if missing.
+    ttl: dictionary from entity class to the number of seconds a stored
+         entity is used. Only the instances of these classes are stored,
+         e.g. ttl={Processtype: 86400, Udfconfig: 86400}
+    """
+
+    def __init__(self, directory, ttl=None):
+        self.directory = directory
+        self.ttl = dict(ttl or {})
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    def path(self, uri):
+        "Return the file in which the XML of uri is stored."
+        name = hashlib.sha1(uri.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.xml.gz')
+
+    def load(self, entity):
+        "Return the stored XML root of entity, or None if missing or expired."
+        ttl = self.ttl.get(entity.__class__)
+        if ttl is None:
+            return None
+        path = self.path(entity.uri)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+            with gzip.open(path, 'rb') as infile:
+                return ElementTree.fromstring(infile.read())
+        except (IOError, OSError, EOFError, ElementTree.ParseError):
+            return None
+
+    def store(self, entity):
+        "Store the XML root of entity if its class is cached."
+        if entity.__class__ not in self.ttl or entity.root is None:
+            return
+        data = ElementTree.tostring(entity.root, encoding='utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as outfile:
+                with gzip.GzipFile(fileobj=outfile, mode='wb') as gzfile:
+                    gzfile.write(data)
+            getattr(os, 'replace', os.rename)(tmp_path, self.path(entity.uri))
+        except (IOError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def remove(self, uri):
+        try:
+            os.remove(self.path(uri))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.xml.gz'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
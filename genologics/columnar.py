@@ -0,0 +1,122 @@
+"""Python interface to GenoLogics LIMS via its REST API.
+
+Bulk export of the UDF values of many entities as typed columns.
+
+Requires numpy; pandas or pyarrow for the DataFrame and Table outputs.
+"""
+
+from collections import OrderedDict
+
+from genologics.constants import nsmap
+
+FORMATS = ('pandas', 'arrow', 'numpy')
+
+
+class UdfColumn(object):
+    """The raw text of one UDF for a list of entities.
+    type: The lower case UDF type, e.g. 'numeric', of the first value seen.
+    texts: One text per entity, None where the UDF is missing or empty.
+    """
+
+    def __init__(self, name, type, size):
+        self.name = name
+        self.type = type
+        self.texts = [None] * size
+
+    def to_numpy(self):
+        """Return (values, missing): the values as a numpy array and the
+        boolean array of the missing values.
+        Numeric is float64 with NaN, Date is datetime64[D] with NaT, Boolean
+        is bool with False and other types are object arrays of strings.
+        The conversions of numbers and dates are done by numpy."""
+        import numpy
+        texts = numpy.array(self.texts, dtype=object)
+        missing = numpy.array([text is None for text in self.texts], dtype=bool)
+        if self.type == 'numeric':
+            texts[missing] = 'nan'
+            values = texts.astype(str).astype(numpy.float64)
+        elif self.type == 'date':
+            texts[missing] = 'NaT'
+            values = texts.astype(str).astype('datetime64[D]')
+        elif self.type == 'boolean':
+            values = texts == 'true'
+            values = values.astype(bool)
+        else:
+            values = texts
+        return values, missing
+
+
+def udf_columns(entities, fields=None):
+    """Collect the UDF texts of the entities, which must be loaded.
+    fields: The names of the UDFs to collect; by default all UDFs, in
+            order of first appearance.
+    Return an OrderedDict from UDF name to UdfColumn.
+    """
+    tag = nsmap('udf:field')
+    size = len(entities)
+    columns = OrderedDict()
+    if fields is not None:
+        for name in fields:
+            columns[name] = None
+    for position, entity in enumerate(entities):
+        for node in entity.root:
+            if node.tag != tag:
+                continue
+            name = node.attrib['name']
+            column = columns.get(name)
+            if column is None:
+                if fields is not None and name not in columns:
+                    continue
+                column = columns[name] = UdfColumn(name, node.attrib['type'].lower(), size)
+            if node.text:
+                column.texts[position] = node.text
+    for name, column in columns.items():
+        if column is None:  # requested but never seen
+            columns[name] = UdfColumn(name, 'string', size)
+    return columns
+
+
+def udf_frame(entities, fields=None, format='pandas'):
+    """Return the UDF values of the entities, which must be loaded, as typed
+    columns. The rows are the entities, identified by their LIMS id.
+    fields: The names of the UDFs to export; by default all of them.
+    format: 'pandas' for a DataFrame indexed by id, where missing Boolean
+            values are <NA> in a nullable boolean column;
+            'arrow' for a pyarrow Table with an 'id' column, where missing
+            values are nulls;
+            'numpy' for a tuple (ids, columns) where columns is an
+            OrderedDict from UDF name to array, and Boolean columns with
+            missing values are masked arrays.
+    """
+    if format not in FORMATS:
+        raise ValueError("format must be one of %s" % ', '.join(FORMATS))
+    ids = [entity.id for entity in entities]
+    columns = udf_columns(entities, fields)
+    if format == 'pandas':
+        import pandas
+        data = OrderedDict()
+        for name, column in columns.items():
+            values, missing = column.to_numpy()
+            if column.type == 'boolean':
+                values = pandas.arrays.BooleanArray(values, missing)
+            data[name] = values
+        return pandas.DataFrame(data, index=pandas.Index(ids, name='id'), columns=list(columns))
+    elif format == 'arrow':
+        import pyarrow
+        arrays = [pyarrow.array(ids)]
+        for name, column in columns.items():
+            values, missing = column.to_numpy()
+            if column.type in ('numeric', 'date', 'boolean'):
+                arrays.append(pyarrow.array(values, mask=missing))
+            else:
+                arrays.append(pyarrow.array(list(values), type=pyarrow.string()))
+        return pyarrow.Table.from_arrays(arrays, names=['id'] + list(columns))
+    else:
+        import numpy
+        data = OrderedDict()
+        for name, column in columns.items():
+            values, missing = column.to_numpy()
+            if column.type == 'boolean' and missing.any():
+                values = numpy.ma.masked_array(values, mask=missing)
+            data[name] = values
+        return ids, data
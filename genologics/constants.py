@@ -7,7 +7,7 @@ Copyright (C) 2012 Per Kraulis
 """
 
 import re
-from xml.etree import ElementTree
+from genologics.etree import ElementTree
 
 _NSMAP = dict(
         art='http://genologics.com/ri/artifact',
@@ -42,7 +42,7 @@ _NSMAP = dict(
 )
 
 for prefix, uri in _NSMAP.items():
-    ElementTree._namespace_map[uri] = prefix
+    ElementTree.register_namespace(prefix, uri)
 
 _NSPATTERN = re.compile(r'(\{)(.+?)(\})')
 
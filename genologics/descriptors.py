@@ -14,14 +14,121 @@ except ImportError:
     from urlparse import urlsplit, urlparse, parse_qs, urlunparse
 
 import datetime
+import re
 import time
-from collections import MutableSet
-from xml.etree import ElementTree
+from collections import MutableSet, OrderedDict
+from genologics.etree import BACKEND, ElementTree
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+_NAMESPACE = re.compile(r'^\{[^}]*\}')
+_child_tags = dict()
+
+
+class ChildIndex(object):
+    """The children of an element by tag, each tag looked up once so that
+    descriptors reading it again get it from a dictionary. Used with lxml
+    only, where find() goes through a Python ElementPath implementation."""
+
+    def __init__(self, element):
+        self.element = element
+        self.first = dict()
+        self.children = dict()
+
+    def find(self, tag):
+        "Return the first child with the tag, or None."
+        try:
+            return self.first[tag]
+        except KeyError:
+            node = self.first[tag] = next(self.element.iterchildren(tag), None)
+            return node
+
+    def findall(self, tag):
+        "Return the list of the children with the tag."
+        nodes = self.children.get(tag)
+        if nodes is None:
+            nodes = self.children[tag] = list(self.element.iterchildren(tag))
+        return list(nodes)
+
+
+def _is_child_tag(tag):
+    "Return True if tag selects children by name only, not by a path."
+    try:
+        return _child_tags[tag]
+    except KeyError:
+        local = _NAMESPACE.sub('', tag)
+        result = _child_tags[tag] = not any(c in local for c in '/*.[@{')
+        return result
+
+
+def invalidate(instance, tag=None):
+    """Drop the ChildIndex and the InputOutputMaps of instance. Code adding or
+    removing children of the root of an entity, rather than replacing the
+    root, must call it.
+    tag: The tag of the children added or removed, if known; the
+         InputOutputMaps are then only dropped for 'input-output-map'.
+    """
+    instance._index = None
+    if tag is not None and tag != 'input-output-map':
+        return
+    views = getattr(instance, '_views', None)
+    if isinstance(views, dict):
+        for key in [key for key in views if isinstance(key, tuple) and key[0] is InputOutputMaps]:
+            del views[key]
+
+
+def mark_dirty(instance):
+    """Record that the root of instance has local changes not saved yet.
+    The LIMS cache neither drops nor revalidates a dirty root; put() and
+    loading a new root clear the flag."""
+    instance._dirty = True
+
+
+if BACKEND == 'lxml':
+
+    def _child_index(instance):
+        """Return the ChildIndex of the root of instance, kept on the instance
+        until the root is replaced or invalidate() is called."""
+        root = instance.root
+        index = getattr(instance, '_index', None)
+        if index.__class__ is not ChildIndex or index.element is not root:
+            index = instance._index = ChildIndex(root)
+        return index
+
+    def find(instance, tag):
+        "Return the first element matching tag in the root of instance."
+        if _is_child_tag(tag):
+            return _child_index(instance).find(tag)
+        return instance.root.find(tag)
+
+    def findall(instance, tag):
+        "Return the list of elements matching tag in the root of instance."
+        if _is_child_tag(tag):
+            return _child_index(instance).findall(tag)
+        return instance.root.findall(tag)
+
+else:
+
+    def find(instance, tag):
+        "Return the first element matching tag in the root of instance."
+        return instance.root.find(tag)
+
+    def findall(instance, tag):
+        "Return the list of elements matching tag in the root of instance."
+        return instance.root.findall(tag)
+
+
+def find_rootnode(instance, rootkeys):
+    "Return the element reached from the root of instance by the rootkeys."
+    if not rootkeys:
+        return instance.root
+    rootnode = find(instance, rootkeys[0])
+    for rootkey in rootkeys[1:]:
+        rootnode = rootnode.find(rootkey)
+    return rootnode
+
 
 class BaseDescriptor(object):
     "Abstract base descriptor for an instance attribute."
@@ -40,7 +147,7 @@ class TagDescriptor(BaseDescriptor):
 
     def get_node(self, instance):
         if self.tag:
-            return instance.root.find(self.tag)
+            return find(instance, self.tag)
         else:
             return instance.root
 
@@ -65,7 +172,9 @@ class StringDescriptor(TagDescriptor):
             # create the new tag
             node = ElementTree.Element(self.tag)
             instance.root.append(node)
+            invalidate(instance)
         node.text = str(value)
+        mark_dirty(instance)
 
 
 class StringAttributeDescriptor(TagDescriptor):
@@ -80,6 +189,7 @@ class StringAttributeDescriptor(TagDescriptor):
     def __set__(self, instance, value):
         instance.get()
         instance.root.attrib[self.tag] = value
+        mark_dirty(instance)
 
 
 class StringTagAttributeDescriptor(TagDescriptor):
@@ -104,7 +214,9 @@ class StringTagAttributeDescriptor(TagDescriptor):
             # create the new tag
             node = ElementTree.Element(self.tag)
             instance.root.append(node)
+            invalidate(instance)
         node.attrib[self.attribute] = str(value)
+        mark_dirty(instance)
 
 
 class StringListDescriptor(TagDescriptor):
@@ -115,7 +227,7 @@ class StringListDescriptor(TagDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        for node in instance.root.findall(self.tag):
+        for node in findall(instance, self.tag):
             result.append(node.text)
         return result
 
@@ -128,9 +240,9 @@ class StringDictionaryDescriptor(TagDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = dict()
-        node = instance.root.find(self.tag)
+        node = find(instance, self.tag)
         if node is not None:
-            for node2 in node.getchildren():
+            for node2 in node:
                 result[node2.tag] = node2.text
         return result
 
@@ -181,6 +293,7 @@ class UdfDictionary(object):
 
     def __init__(self, instance, *args, **kwargs):
         self.instance = instance
+        self.root = instance.root
         self._udt = kwargs.pop('udt', False)
         self.rootkeys = args
         self._rootnode = None
@@ -191,9 +304,7 @@ class UdfDictionary(object):
     @property
     def rootnode(self):
         if self._rootnode is None:
-            self._rootnode = self.instance.root
-            for rootkey in self.rootkeys:
-                self._rootnode = self._rootnode.find(rootkey)
+            self._rootnode = find_rootnode(self.instance, self.rootkeys)
         return self._rootnode
 
     def get_udt(self):
@@ -210,134 +321,148 @@ class UdfDictionary(object):
         elem = self.rootnode.find(nsmap('udf:type'))
         assert elem is not None
         elem.set('name', name)
+        mark_dirty(self.instance)
 
     udt = property(get_udt, set_udt)
 
     def _update_elems(self):
-        self._elems = []
+        self._fields = OrderedDict()
+        self._parent = self.rootnode
+        tag = nsmap('udf:field')
         if self._udt:
             elem = self.rootnode.find(nsmap('udf:type'))
+            self._parent = elem
             if elem is not None:
                 self._udt = elem.attrib['name']
-                self._elems = elem.findall(nsmap('udf:field'))
+                for field in elem.findall(tag):
+                    self._fields.setdefault(field.attrib['name'], field)
         else:
-            tag = nsmap('udf:field')
-            for elem in self.rootnode.getchildren():
+            for elem in self.rootnode:
                 if elem.tag == tag:
-                    self._elems.append(elem)
+                    self._fields.setdefault(elem.attrib['name'], elem)
+
+    @property
+    def _elems(self):
+        "The udf:field elements, in document order."
+        return list(self._fields.values())
 
     def _prepare_lookup(self):
-        self._lookup = dict()
-        for elem in self._elems:
-            type = elem.attrib['type'].lower()
-            value = elem.text
-            if not value:
-                value = None
-            elif type == 'numeric':
-                try:
-                    value = int(value)
-                except ValueError:
-                    value = float(value)
-            elif type == 'boolean':
-                value = value == 'true'
-            elif type == 'date':
-                value = datetime.date(*time.strptime(value, "%Y-%m-%d")[:3])
-            self._lookup[elem.attrib['name']] = value
+        self._lookup = OrderedDict()
+        for elem in self._fields.values():
+            self._lookup[elem.attrib['name']] = self._parse(elem)
+
+    def _parse(self, elem):
+        type = elem.attrib['type'].lower()
+        value = elem.text
+        if not value:
+            value = None
+        elif type == 'numeric':
+            try:
+                value = int(value)
+            except ValueError:
+                value = float(value)
+        elif type == 'boolean':
+            value = value == 'true'
+        elif type == 'date':
+            value = datetime.date(*time.strptime(value, "%Y-%m-%d")[:3])
+        return value
 
     def __contains__(self, key):
-        try:
-            self._lookup[key]
-        except KeyError:
-            return False
-        return True
+        return key in self._lookup
 
     def __getitem__(self, key):
         return self._lookup[key]
 
     def __setitem__(self, key, value):
-        self._lookup[key] = value
-        for node in self._elems:
-            if node.attrib['name'] != key: continue
+        node = self._fields.get(key)
+        if node is not None:
             vtype = node.attrib['type'].lower()
 
             if value is None:
-                pass
-            elif vtype == 'string':
-                if not self._is_string(value):
-                    raise TypeError('String UDF requires str or unicode value')
-            elif vtype == 'str':
-                if not self._is_string(value):
-                    raise TypeError('String UDF requires str or unicode value')
-            elif vtype == 'text':
+                text = value
+            elif vtype in ('string', 'str', 'text'):
                 if not self._is_string(value):
-                    raise TypeError('Text UDF requires str or unicode value')
+                    raise TypeError('%s UDF requires str or unicode value' % (
+                                    'Text' if vtype == 'text' else 'String'))
+                text = value
             elif vtype == 'numeric':
                 if not isinstance(value, (int, float)):
                     raise TypeError('Numeric UDF requires int or float value')
-                value = str(value)
+                text = str(value)
             elif vtype == 'boolean':
                 if not isinstance(value, bool):
                     raise TypeError('Boolean UDF requires bool value')
-                value = value and 'true' or 'false'
+                text = value and 'true' or 'false'
             elif vtype == 'date':
                 if not isinstance(value, datetime.date):  # Too restrictive?
                     raise TypeError('Date UDF requires datetime.date value')
-                value = str(value)
+                text = str(value)
             elif vtype == 'uri':
                 if not self._is_string(value):
                     raise TypeError('URI UDF requires str or punycode (unicode) value')
-                value = str(value)
+                text = str(value)
             else:
                 raise NotImplemented("UDF type '%s'" % vtype)
 
-            node.text = value
-            break
+            node.text = text
         else:  # Create new entry; heuristics for type
             if self._is_string(value):
                 vtype = '\n' in value and 'Text' or 'String'
+                text = value
             elif isinstance(value, bool):
                 vtype = 'Boolean'
-                value = value and 'true' or 'false'
+                text = value and 'true' or 'false'
             elif isinstance(value, (int, float)):
                 vtype = 'Numeric'
-                value = str(value)
+                text = str(value)
             elif isinstance(value, datetime.date):
                 vtype = 'Date'
-                value = str(value)
+                text = str(value)
             else:
                 raise NotImplementedError("Cannot handle value of type '%s'"
                                           " for UDF" % type(value))
-            if self._udt:
-                root = self.rootnode.find(nsmap('udf:type'))
-            else:
-                root = self.rootnode
-            elem = ElementTree.SubElement(root,
+            elem = ElementTree.SubElement(self._parent,
                                           nsmap('udf:field'),
                                           type=vtype,
                                           name=key)
-            elem.text = value
-
-            #update the internal elements and lookup with new values
-            self._update_elems()
-            self._prepare_lookup()
+            elem.text = text
+            self._fields[key] = elem
+            invalidate(self.instance, nsmap('udf:field'))
+        self._lookup[key] = value
+        mark_dirty(self.instance)
+
+    def update(self, *args, **kwargs):
+        """Set the UDFs of a mapping, or of an iterable of (name, value)
+        pairs, and of the keyword arguments, like dict.update."""
+        for mapping in args + (kwargs,):
+            if hasattr(mapping, 'keys'):
+                pairs = [(key, mapping[key]) for key in mapping.keys()]
+            else:
+                pairs = mapping
+            for key, value in pairs:
+                self[key] = value
 
     def __delitem__(self, key):
         del self._lookup[key]
-        for node in self._elems:
-            if node.attrib['name'] == key:
-                self.rootnode.remove(node)
-                break
+        node = self._fields.pop(key, None)
+        if node is not None:
+            self._parent.remove(node)
+            invalidate(self.instance, nsmap('udf:field'))
+            mark_dirty(self.instance)
 
     def items(self):
         return list(self._lookup.items())
 
     def clear(self):
-        for elem in self._elems:
-            self.rootnode.remove(elem)
-        self._update_elems()
+        for elem in self._fields.values():
+            self._parent.remove(elem)
+        invalidate(self.instance, nsmap('udf:field'))
+        mark_dirty(self.instance)
+        self._fields.clear()
+        self._lookup.clear()
 
     def __iter__(self):
-        return self
+        return iter(list(self._lookup.keys()))
 
     def __next__(self):
         try:
@@ -347,6 +472,8 @@ class UdfDictionary(object):
         self.location = self.location + 1
         return ret
 
+    next = __next__
+
     def get(self, key, default=None):
         return self._lookup.get(key, default)
 
@@ -363,17 +490,29 @@ class UdfDictionaryDescriptor(BaseDescriptor):
 
     def __get__(self, instance, cls):
         instance.get()
-        self.value = UdfDictionary(instance, *self.rootkeys, udt=self._UDT)
+        self.value = self.get_view(instance)
         return self.value
 
     def __set__(self, instance, dict_value):
         instance.get()
-        udf_dict = UdfDictionary(instance, *self.rootkeys, udt=self._UDT)
+        udf_dict = self.get_view(instance)
         udf_dict.clear()
         for k in dict_value:
             udf_dict[k] = dict_value[k]
 
 
+    def get_view(self, instance):
+        """Return the UdfDictionary of instance, parsed once per root.
+        It is kept on the instance until the root is replaced."""
+        views = getattr(instance, '_views', None)
+        if not isinstance(views, dict):
+            views = instance._views = dict()
+        view = views.get(self)
+        if view is None or view.root is not instance.root:
+            view = views[self] = UdfDictionary(instance, *self.rootkeys, udt=self._UDT)
+        return view
+
+
 class UdtDictionaryDescriptor(UdfDictionaryDescriptor):
     """An instance attribute containing a dictionary of UDF values
     in a UDT represented by multiple XML elements.
@@ -391,7 +530,7 @@ class PlacementDictionaryDescriptor(TagDescriptor):
         from genologics.entities import Artifact
         instance.get()
         self.value = dict()
-        for node in instance.root.findall(self.tag):
+        for node in findall(instance, self.tag):
             key = node.find('value').text
             self.value[key] = Artifact(instance.lims, uri=node.attrib['uri'])
         return self.value
@@ -405,7 +544,7 @@ class ExternalidListDescriptor(BaseDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        for node in instance.root.findall(nsmap('ri:externalid')):
+        for node in findall(instance, nsmap('ri:externalid')):
             result.append((node.attrib.get('id'), node.attrib.get('uri')))
         return result
 
@@ -419,7 +558,7 @@ class EntityDescriptor(TagDescriptor):
 
     def __get__(self, instance, cls):
         instance.get()
-        node = instance.root.find(self.tag)
+        node = find(instance, self.tag)
         if node is None:
             return None
         else:
@@ -432,7 +571,9 @@ class EntityDescriptor(TagDescriptor):
             # create the new tag
             node = ElementTree.Element(self.tag)
             instance.root.append(node)
+            invalidate(instance)
         node.attrib['uri'] = value.uri
+        mark_dirty(instance)
 
 
 class EntityAttributeDescriptor(BaseDescriptor):
@@ -461,7 +602,7 @@ class EntityListDescriptor(EntityDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        for node in instance.root.findall(self.tag):
+        for node in findall(instance, self.tag):
             result.append(self.klass(instance.lims, uri=node.attrib['uri']))
 
         return result
@@ -479,9 +620,7 @@ class NestedAttributeListDescriptor(StringAttributeDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        rootnode = instance.root
-        for rootkey in self.rootkeys:
-            rootnode = rootnode.find(rootkey)
+        rootnode = find_rootnode(instance, self.rootkeys)
         for node in rootnode.findall(self.tag):
             result.append(node.attrib)
         return result
@@ -499,9 +638,7 @@ class NestedStringListDescriptor(StringListDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        rootnode = instance.root
-        for rootkey in self.rootkeys:
-            rootnode = rootnode.find(rootkey)
+        rootnode = find_rootnode(instance, self.rootkeys)
         for node in rootnode.findall(self.tag):
             result.append(node.text)
         return result
@@ -519,9 +656,7 @@ class NestedEntityListDescriptor(EntityListDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        rootnode = instance.root
-        for rootkey in self.rootkeys:
-            rootnode = rootnode.find(rootkey)
+        rootnode = find_rootnode(instance, self.rootkeys)
         for node in rootnode.findall(self.tag):
             result.append(self.klass(instance.lims, uri=node.attrib['uri']))
         return result
@@ -538,9 +673,7 @@ class InlineEntityListDescriptor(EntityListDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        rootnode=instance.root
-        for rootkey in self.rootkeys:
-            rootnode=rootnode.find(rootkey)
+        rootnode = find_rootnode(instance, self.rootkeys)
         for node in rootnode.findall(self.tag):
             entity = self.klass(instance.lims, uri=node.attrib['uri'])
             entity.root = node
@@ -560,9 +693,7 @@ class ObjectListDescriptor(EntityListDescriptor):
     def __get__(self, instance, cls):
         instance.get()
         result = []
-        rootnode=instance.root
-        for rootkey in self.rootkeys:
-            rootnode=rootnode.find(rootkey)
+        rootnode = find_rootnode(instance, self.rootkeys)
         for node in rootnode.findall(self.tag):
             result.append(self.klass(instance.lims, node))
         return result
@@ -574,7 +705,7 @@ class DimensionDescriptor(TagDescriptor):
 
     def __get__(self, instance, cls):
         instance.get()
-        node = instance.root.find(self.tag)
+        node = find(instance, self.tag)
         return dict(is_alpha=node.find('is-alpha').text.lower() == 'true',
                     offset=int(node.find('offset').text),
                     size=int(node.find('size').text))
@@ -588,7 +719,7 @@ class LocationDescriptor(TagDescriptor):
     def __get__(self, instance, cls):
         from genologics.entities import Container
         instance.get()
-        node = instance.root.find(self.tag)
+        node = find(instance, self.tag)
         uri = node.find('container').attrib['uri']
         return Container(instance.lims, uri=uri), node.find('value').text
 
@@ -598,8 +729,9 @@ class ReagentLabelSet(MutableSet):
     also updates the underlying XML. It thus supports adding and deleting
     reagent labels."""
 
-    def __init__(self, root):
+    def __init__(self, root, instance=None):
         self.root = root
+        self.instance = instance
         self.value = set()
         for node in self.root.findall('reagent-label'):
             try:
@@ -624,11 +756,18 @@ class ReagentLabelSet(MutableSet):
         else:
             raise RuntimeError("Internal state is not consistent")
         self.root.remove(node)
+        self._changed()
 
     def add(self, name):
         if not name in self.value:
             self.value.add(name)
             ElementTree.SubElement(self.root, 'reagent-label', {'name': name})
+            self._changed()
+
+    def _changed(self):
+        if self.instance is not None:
+            invalidate(self.instance, 'reagent-label')
+            mark_dirty(self.instance)
 
     def __str__(self):
         return str(self.value)
@@ -645,30 +784,31 @@ class ReagentLabelSetDescriptor(BaseDescriptor):
     Allows read-write access."""
     def __get__(self, instance, cls):
         instance.get()
-        return ReagentLabelSet(instance.root)
+        return ReagentLabelSet(instance.root, instance)
 
 
-class InputOutputMapList(BaseDescriptor):
-    """An instance attribute yielding a list of tuples (input, output)
-    where each item is a dictionary, representing the input/output
-    maps of a Process instance.
+class InputOutputMaps(object):
+    """The input/output maps of a Process or StepDetails, parsed once and
+    indexed by the limsid of the inputs and of the outputs.
+    maps: The list of tuples (input, output) of dictionaries, in document
+          order; output is None for inputs without an output.
     """
 
-    def __init__(self, *args):
-        super(BaseDescriptor, self).__init__()
-        self.rootkeys = args
-
-    def __get__(self, instance, cls):
-        instance.get()
-        self.value = []
-        rootnode = instance.root
-        for rootkey in self.rootkeys:
-            rootnode = rootnode.find(rootkey)
-        for node in rootnode.findall('input-output-map'):
+    def __init__(self, instance, *rootkeys):
+        self.root = instance.root
+        self.rootnode = find_rootnode(instance, rootkeys)
+        self.maps = []
+        self._by_input = OrderedDict()
+        self._by_output = OrderedDict()
+        for node in self.rootnode.findall('input-output-map'):
             input = self.get_dict(instance.lims, node.find('input'))
             output = self.get_dict(instance.lims, node.find('output'))
-            self.value.append((input, output))
-        return self.value
+            io = (input, output)
+            self.maps.append(io)
+            if input is not None:
+                self._by_input.setdefault(input.get('limsid'), []).append(io)
+            if output is not None:
+                self._by_output.setdefault(output.get('limsid'), []).append(io)
 
     def get_dict(self, lims, node):
         from genologics.entities import Artifact, Process
@@ -688,3 +828,81 @@ class InputOutputMapList(BaseDescriptor):
         if node is not None:
             result['parent-process'] = Process(lims, node.attrib['uri'])
         return result
+
+    def is_current(self, instance):
+        "Return True if the maps were parsed from the current root of instance."
+        return self.root is instance.root
+
+    def outputs(self, limsid, output_type=None, generation_type=None):
+        """Return the output dictionaries of the input with the limsid.
+        output_type: Only outputs of this output-type, e.g. 'ResultFile'.
+        generation_type: Only outputs of this output-generation-type,
+                         e.g. 'PerInput' or 'PerAllInputs'.
+        """
+        return [o for i, o in self._by_input.get(limsid, ())
+                if o is not None
+                and (output_type is None or o.get('output-type') == output_type)
+                and (generation_type is None or o.get('output-generation-type') == generation_type)]
+
+    def inputs(self, limsid):
+        "Return the input dictionaries of the output with the limsid."
+        return [i for i, o in self._by_output.get(limsid, ()) if i is not None]
+
+    def input_ids(self):
+        "Return the unique limsids of the inputs, in document order."
+        return [limsid for limsid in self._by_input if limsid is not None]
+
+    def output_ids(self, output_type=None, generation_type=None):
+        """Return the unique limsids of the outputs, in document order.
+        output_type, generation_type: As for outputs().
+        """
+        if output_type is None and generation_type is None:
+            return [limsid for limsid in self._by_output if limsid is not None]
+        result = []
+        for limsid, ios in self._by_output.items():
+            o = ios[0][1]
+            if limsid is not None \
+                    and (output_type is None or o.get('output-type') == output_type) \
+                    and (generation_type is None or o.get('output-generation-type') == generation_type):
+                result.append(limsid)
+        return result
+
+
+class InputOutputMapList(BaseDescriptor):
+    """An instance attribute yielding a list of tuples (input, output)
+    where each item is a dictionary, representing the input/output
+    maps of a Process instance.
+    """
+
+    def __init__(self, *args):
+        super(BaseDescriptor, self).__init__()
+        self.rootkeys = args
+
+    def __get__(self, instance, cls):
+        instance.get()
+        self.value = list(self.get_view(instance).maps)
+        return self.value
+
+    def get_view(self, instance):
+        """Return the InputOutputMaps of instance, parsed once per root.
+        It is shared by the descriptors with the same rootkeys and kept on
+        the instance until the root is replaced or invalidate() is called."""
+        views = getattr(instance, '_views', None)
+        if not isinstance(views, dict):
+            views = instance._views = dict()
+        key = (InputOutputMaps, self.rootkeys)
+        view = views.get(key)
+        if view is None or not view.is_current(instance):
+            view = views[key] = InputOutputMaps(instance, *self.rootkeys)
+        return view
+
+
+class InputOutputMapIndexDescriptor(InputOutputMapList):
+    """An instance attribute yielding the InputOutputMaps of a Process
+    instance, for lookups of the outputs of an input and vice versa.
+    """
+
+    def __get__(self, instance, cls):
+        instance.get()
+        self.value = self.get_view(instance)
+        return self.value
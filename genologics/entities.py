@@ -10,10 +10,10 @@ from genologics.constants import nsmap
 from genologics.descriptors import StringDescriptor, StringDictionaryDescriptor, UdfDictionaryDescriptor, \
     UdtDictionaryDescriptor, ExternalidListDescriptor, EntityDescriptor, BooleanDescriptor, EntityListDescriptor, \
     StringAttributeDescriptor, StringTagAttributeDescriptor, StringListDescriptor, DimensionDescriptor, IntegerDescriptor, \
-    PlacementDictionaryDescriptor, InputOutputMapList, LocationDescriptor, NestedEntityListDescriptor, \
+    PlacementDictionaryDescriptor, InputOutputMapList, InputOutputMapIndexDescriptor, LocationDescriptor, NestedEntityListDescriptor, \
     ReagentLabelSetDescriptor, EntityAttributeDescriptor, ObjectListDescriptor, InlineEntityListDescriptor,\
     NestedStringListDescriptor, NestedAttributeListDescriptor, IntegerAttributeDescriptor,\
-    StringTagAttributeDescriptor
+    StringTagAttributeDescriptor, invalidate, mark_dirty
 
 try:
     from urllib.parse import urlsplit, urlparse, parse_qs, urlunparse
@@ -21,13 +21,25 @@ except ImportError:
     from urlparse import urlsplit, urlparse, parse_qs, urlunparse
 
 import requests
-from xml.etree import ElementTree
+from genologics.etree import ElementTree
 
 import logging
+import time
 from collections import defaultdict
 
 logger = logging.getLogger(__name__)
-CACHE_N_ENTRIES = 10000
+
+try:
+    from sys import intern
+except ImportError:  # Python 2, where intern is a builtin
+    pass
+
+
+def _intern(value):
+    "Return the interned copy of the str value; other values are returned as is."
+    if isinstance(value, str):
+        return intern(value)
+    return value
 
 
 class SampleHistory:
@@ -93,77 +105,16 @@ class SampleHistory:
 
     def alternate_history(self, out_art, in_art=None):
         """This is a try at another way to generate the history.
-        This one iterates over Artifact.parent_process and Process.all_inputs()
+        The analytes of the sample and their parent processes are loaded in
+        bulk into a LineageGraph, which is walked from the output upwards.
         Then, it takes all the child processes for each input (because we want
         qc processes too) and puts everything in a dictionnary.
         """
-        history = {}
-        hist_list = []
+        from genologics.lineage import LineageGraph
         # getting the list of all expected analytes.
         artifacts = self.lims.get_artifacts(sample_name=self.sample_name, type='Analyte', resolve=False)
-        processes = []
-        inputs = []
-        if in_art:
-            # If theres an input artifact given, I need to make a loop for this one, before treating it as an output
-            starting_art = in_art
-            inputs.append(in_art)
-            history[in_art] = {}
-            # If there is a loacl map, use it. else, query the lims.
-            if self.processes_per_artifact and in_art in self.processes_per_artifact:
-                valid_pcs = self.processes_per_artifact[in_art]
-            else:
-                valid_pcs = self.lims.get_processes(inputartifactlimsid=in_art)
-
-            for tempProcess in valid_pcs:
-                history[in_art][tempProcess.id] = {'date': tempProcess.date_run,
-                                                   'id': tempProcess.id,
-                                                   'outart': (out_art if out_art in [out.id for out in tempProcess.all_outputs()] else None),
-                                                   'inart': in_art,
-                                                   'type': tempProcess.type.id,
-                                                   'name': tempProcess.type.name}
-        else:
-            starting_art = out_art
-        # main iteration
-        # it is quite heavy on logger at info level
-        not_done = True
-        while not_done:
-            logger.info("looking for " + (starting_art))
-            not_done = False
-            for o in artifacts:
-                logger.info(o.id)
-                if o.id == starting_art:
-                    if o.parent_process is None:
-                        # flow control : if there is no parent process, we can stop iterating, we're done.
-                        not_done = False
-                        break  # breaks the for artifacts, we are done anyway.
-                    else:
-                        not_done = True  # keep the loop running
-                    logger.info("found it")
-                    processes.append(o.parent_process)
-                    logger.info("looking for inputs of " + o.parent_process.id)
-                    for i in o.parent_process.all_inputs():
-                        logger.info(i.id)
-                        if i in artifacts:
-                            history[i.id] = {}
-                            for tempProcess in (self.processes_per_artifact[i.id] if self.processes_per_artifact else self.lims.get_processes(inputartifactlimsid=i.id)):  # If there is a loacl map, use it. else, query the lims.
-                                history[i.id][tempProcess.id] = {'date': tempProcess.date_run,
-                                                                 'id': tempProcess.id,
-                                                                 'outart': (
-                                                                 o.id if tempProcess.id == o.parent_process.id else None),
-                                                                 'inart': i.id,
-                                                                 'type': tempProcess.type.id,
-                                                                 'name': tempProcess.type.name}
-
-                            logger.info("found input " + i.id)
-                            inputs.append(
-                                i.id)  # this will be the sorted list of artifacts used to rebuild the history in order
-                            # while increment
-                            starting_art = i.id
-
-                            break  # break the for allinputs, if we found the right one
-                    break  # breaks the for artifacts if we matched the current one
-        self.history = history
-        self.history_list = inputs
+        graph = LineageGraph(self.lims, artifacts, processes_per_artifact=self.processes_per_artifact)
+        self.history, self.history_list = graph.history(out_art, in_art)
 
     def get_analyte_hist_sorted(self, out_artifact, input_art=None):
         """Makes a history map of an artifac, using the samp_art_map
@@ -216,7 +167,7 @@ class SampleHistory:
         processes that the input artifact has been involved in, but that are not
         part of the historychain get the outart set to None. This is very important."""
         # Use the local process map if we have one, else, query the lims
-        for process in self.processes_per_artifact[input_art] if self.processes_per_artifact else lims.get_processes(
+        for process in self.processes_per_artifact[input_art] if self.processes_per_artifact else self.lims.get_processes(
                 inputartifactlimsid=input_art):
             # outputs = map(lambda a: (a.id), process.all_outputs())
             outputs = [a.id for a in process.all_outputs()]
@@ -235,11 +186,18 @@ class SampleHistory:
 
 
 class Entity(object):
-    "Base class for the entities in the LIMS database."
+    """Base class for the entities in the LIMS database.
+    The instances have no __dict__, so subclasses must declare __slots__ too.
+    Equal instances have the same URI."""
+
+    __slots__ = ('__weakref__', 'lims', '_uri', '_id', '_root', '_validators',
+                 '_loaded_at', '_index', '_views', '_dirty')
 
     _TAG = None
     _URI = None
     _PREFIX = None
+    # True if the class is supported by the batch/retrieve API
+    _BATCH = False
 
     def __new__(cls, lims, uri=None, id=None, _create_new=False):
         if not uri:
@@ -262,13 +220,29 @@ class Entity(object):
             if not uri:
                 uri = lims.get_uri(self._URI, id)
             lims.cache[uri] = self
-            lims.cache_list.append(uri)
-            if len(lims.cache_list) > CACHE_N_ENTRIES:
-                del lims.cache[lims.cache_list.pop(0)]
         self.lims = lims
-        self._uri = uri
+        self._set_uri(uri)
+        self._validators = None
         self.root = None
 
+    def __eq__(self, other):
+        if not isinstance(other, Entity):
+            return NotImplemented
+        if self._uri is None:  # not created in the LIMS yet
+            return self is other
+        return self._uri == other._uri
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        if self._uri is None:
+            return object.__hash__(self)
+        return hash(self._uri)
+
     def __str__(self):
         return "%s(%s)" % (self.__class__.__name__, self.id)
 
@@ -285,18 +259,75 @@ class Entity(object):
     @property
     def id(self):
         "Return the LIMS id; obtained from the URI."
-        parts = urlsplit(self.uri)
-        return parts.path.split('/')[-1]
+        return self._id
+
+    def _set_uri(self, uri):
+        "Set the URI, interned since many instances and dictionaries share it, and the LIMS id."
+        self._uri = _intern(uri)
+        self._id = _intern(urlsplit(uri).path.split('/')[-1]) if uri else None
+
+    def _get_root(self):
+        return self._root
+
+    def _set_root(self, root):
+        self._root = root
+        self._index = None
+        self._views = None
+        self._dirty = False
+        if root is not None:
+            self._loaded_at = time.time()
+            self.lims.cache.root_loaded(self)
+
+    root = property(_get_root, _set_root)
 
     def get(self, force=False):
-        "Get the XML data for this instance."
-        if not force and self.root is not None: return
-        self.root = self.lims.get(self.uri)
+        """Get the XML data for this instance.
+        If the class has a time to live in the LIMS cache, expired data is
+        revalidated with a conditional request when the server provided
+        an ETag or Last-Modified header, and fetched again otherwise.
+        Data with local changes not saved with put() is kept even when it
+        expired, unless force is true.
+        Data is read from and written to the persistent cache of the LIMS,
+        if any.
+        """
+        cache = self.lims.cache
+        persistent_cache = self.lims.persistent_cache
+        validators = None
+        if not force and self._root is not None:
+            if self._dirty or not cache.expired(self):
+                cache.touch(self)
+                return
+            validators = self._validators
+        elif not force and persistent_cache is not None:
+            root = persistent_cache.load(self)
+            if root is not None:
+                self.root = root
+                return
+        if cache.expires(self.__class__):
+            root, self._validators = self.lims.get_validated(self.uri, validators)
+            if root is None:  # Not modified on the server
+                self._loaded_at = time.time()
+                cache.touch(self)
+                return
+            self.root = root
+        else:
+            self.root = self.lims.get(self.uri)
+        if persistent_cache is not None:
+            persistent_cache.store(self)
+
+    def aget(self, force=False):
+        """Return an awaitable getting the XML data for this instance.
+        The instance must have been created with a genologics.aio.AsyncLims.
+        """
+        return self.lims.aget_entity(self, force=force)
 
     def put(self):
         "Save this instance by doing PUT of its serialized XML."
+        if self.root is None:
+            raise ValueError("%r has no XML data to save; it was not loaded" % self)
         data = self.lims.tostring(ElementTree.ElementTree(self.root))
         self.lims.put(self.uri, data)
+        self._dirty = False
 
     def post(self):
         "Save this instance with POST"
@@ -304,8 +335,9 @@ class Entity(object):
         self.lims.post(self.uri, data)
 
     def delete(self):
-        del self.lims.cache[self.uri]
-        self.lims.cache_list.remove(self.uri)
+        self.lims.cache.pop(self.uri)
+        if self.lims.persistent_cache is not None:
+            self.lims.persistent_cache.remove(self.uri)
         self.lims.delete(self.uri)
 
     @classmethod
@@ -332,13 +364,14 @@ class Entity(object):
         instance = cls._create(lims, creation_tag=None, **kwargs)
         data = lims.tostring(ElementTree.ElementTree(instance.root))
         instance.root = lims.post(uri=lims.get_uri(cls._URI), data=data)
-        instance._uri = instance.root.attrib['uri']
+        instance._set_uri(instance.root.attrib['uri'])
         return instance
 
 
 class Lab(Entity):
     "Lab; container of researchers."
 
+    __slots__ = ()
     _URI = 'labs'
     _PREFIX = 'lab'
 
@@ -354,6 +387,7 @@ class Lab(Entity):
 class Researcher(Entity):
     "Person; client scientist or lab personnel. Associated with a lab."
 
+    __slots__ = ()
     _URI = 'researchers'
     _PREFIX = 'res'
 
@@ -378,6 +412,8 @@ class Researcher(Entity):
 class Note(Entity):
     "Note attached to a project or a sample."
 
+    __slots__ = ()
+
     content = StringDescriptor(None)  # root element
 
 
@@ -422,7 +458,9 @@ class Glsstorage(object):
 class File(Entity):
     "File attached to a project or a sample."
 
+    __slots__ = ()
     _URI = 'files'
+    _BATCH = True
 
     attached_to       = StringDescriptor('attached-to')
     content_location  = StringDescriptor('content-location')
@@ -431,8 +469,7 @@ class File(Entity):
 
     def download(self):
         url = "{0}/download".format(self.uri)
-        response = self.lims.request_session.get(url,
-                auth=(self.lims.username, self.lims.password))
+        response = self.lims.request('get', url)
         if response.status_code != 200:
             raise requests.exceptions.HTTPError("Failed to upload file, status code " +
                     str(response.status_code))
@@ -441,9 +478,7 @@ class File(Entity):
 
     def upload(self, data):
         url = "{0}/upload".format(self.uri)
-        response = self.lims.request_session.post(
-                url, auth=(self.lims.username, self.lims.password),
-                files=dict(file=data))
+        response = self.lims.request('post', url, files=dict(file=data))
 
         if response.status_code != 200:
             raise requests.exceptions.HTTPError("Failed to upload file, status code " +
@@ -453,6 +488,7 @@ class File(Entity):
 class Project(Entity):
     "Project concerning a number of samples; associated with a researcher."
 
+    __slots__ = ()
     _URI = 'projects'
     _PREFIX = 'prj'
 
@@ -471,8 +507,10 @@ class Project(Entity):
 class Sample(Entity):
     "Customer's sample to be analyzed; associated with a project."
 
+    __slots__ = ()
     _URI = 'samples'
     _PREFIX = 'smp'
+    _BATCH = True
 
     name           = StringDescriptor('name')
     date_received  = StringDescriptor('date-received')
@@ -496,18 +534,20 @@ class Sample(Entity):
         instance = super(Sample, cls)._create(lims, creation_tag='samplecreation', **kwargs)
 
         location = ElementTree.SubElement(instance.root, 'location')
+        invalidate(instance)
         ElementTree.SubElement(location, 'container', dict(uri=container.uri))
         position_element = ElementTree.SubElement(location, 'value')
         position_element.text = position
         data = lims.tostring(ElementTree.ElementTree(instance.root))
         instance.root = lims.post(uri=lims.get_uri(cls._URI), data=data)
-        instance._uri = instance.root.attrib['uri']
+        instance._set_uri(instance.root.attrib['uri'])
         return instance
 
 
 class Containertype(Entity):
     "Type of container for analyte artifacts."
 
+    __slots__ = ()
     _TAG = 'container-type'
     _URI = 'containertypes'
     _PREFIX = 'ctp'
@@ -522,8 +562,10 @@ class Containertype(Entity):
 class Container(Entity):
     "Container for analyte artifacts."
 
+    __slots__ = ()
     _URI = 'containers'
     _PREFIX = 'con'
+    _BATCH = True
 
     name           = StringDescriptor('name')
     type           = EntityDescriptor('type', Containertype)
@@ -538,11 +580,12 @@ class Container(Entity):
         """Get the dictionary of locations and artifacts
         using the more efficient batch call."""
         result = self.placements.copy()
-        self.lims.get_batch(list(result.values()))
+        self.lims.resolve(list(result.values()))
         return result
 
 
 class Processtype(Entity):
+    __slots__ = ()
     _TAG = 'process-type'
     _URI = 'processtypes'
     _PREFIX = 'ptp'
@@ -553,6 +596,7 @@ class Processtype(Entity):
 
 class Udfconfig(Entity):
     "Instance of field type (cnf namespace)."
+    __slots__ = ()
     _URI = 'configuration/udfs'
 
     name                          = StringDescriptor('name')
@@ -572,6 +616,7 @@ class Udfconfig(Entity):
 class Process(Entity):
     "Process (instance of Processtype) executed producing ouputs from inputs."
 
+    __slots__ = ()
     _URI = 'processes'
     _PREFIX = 'prc'
 
@@ -581,6 +626,7 @@ class Process(Entity):
     technician        = EntityDescriptor('technician', Researcher)
     protocol_name     = StringDescriptor('protocol-name')
     input_output_maps = InputOutputMapList()
+    io_index          = InputOutputMapIndexDescriptor()
     udf               = UdfDictionaryDescriptor()
     udt               = UdtDictionaryDescriptor()
     files             = EntityListDescriptor(nsmap('file:file'), File)
@@ -592,15 +638,14 @@ class Process(Entity):
     def outputs_per_input(self, inart, ResultFile=False, SharedResultFile=False, Analyte=False):
         """Getting all the output artifacts related to a particual input artifact"""
 
-        inouts = [io for io in self.input_output_maps if io[0]['limsid'] == inart]
+        output_type = None
         if ResultFile:
-            inouts = [io for io in inouts if io[1]['output-type'] == 'ResultFile']
+            output_type = 'ResultFile'
         elif SharedResultFile:
-            inouts = [io for io in inouts if io[1]['output-type'] == 'SharedResultFile']
+            output_type = 'SharedResultFile'
         elif Analyte:
-            inouts = [io for io in inouts if io[1]['output-type'] == 'Analyte']
-        outs = [io[1]['uri'] for io in inouts]
-        return outs
+            output_type = 'Analyte'
+        return [o['uri'] for o in self.io_index.outputs(inart, output_type=output_type)]
 
     def input_per_sample(self, sample):
         """gettiung all the input artifacts dereved from the specifyed sample"""
@@ -616,16 +661,17 @@ class Process(Entity):
         """Retrieving all input artifacts from input_output_maps
         if unique is true, no duplicates are returned.
         """
+        io_index = self.io_index
         # if the process has no input, that is not standard and we want to know about it
-        try:
-            ids = [io[0]['limsid'] for io in self.input_output_maps]
-        except TypeError:
+        if any(i is None for i, o in io_index.maps):
             logger.error("Process ", self, " has no input artifacts")
             raise TypeError
         if unique:
-            ids = list(frozenset(ids))
+            ids = io_index.input_ids()
+        else:
+            ids = [i['limsid'] for i, o in io_index.maps]
         if resolve:
-            return self.lims.get_batch([Artifact(self.lims, id=id) for id in ids if id is not None])
+            return self.lims.resolve([Artifact(self.lims, id=id) for id in ids if id is not None])
         else:
             return [Artifact(self.lims, id=id) for id in ids if id is not None]
 
@@ -633,24 +679,26 @@ class Process(Entity):
         """Retrieving all output artifacts from input_output_maps
         if unique is true, no duplicates are returned.
         """
-        # Given how ids is structured, io[1] might be None : some process don't have an output.
-        ids = [io[1]['limsid'] for io in self.input_output_maps if io[1] is not None]
+        io_index = self.io_index
         if unique:
-            ids = list(frozenset(ids))
+            ids = io_index.output_ids()
+        else:
+            # some process don't have an output, so the output might be None
+            ids = [o['limsid'] for i, o in io_index.maps if o is not None]
         if resolve:
-            return self.lims.get_batch([Artifact(self.lims, id=id) for id in ids if id is not None])
+            return self.lims.resolve([Artifact(self.lims, id=id) for id in ids if id is not None])
         else:
             return [Artifact(self.lims, id=id) for id in ids if id is not None]
 
     def shared_result_files(self):
         """Retreve all resultfiles of output-generation-type PerAllInputs."""
-        artifacts = self.all_outputs(unique=True)
-        return [a for a in artifacts if a.output_type == 'SharedResultFile']
+        ids = self.io_index.output_ids(output_type='SharedResultFile')
+        return [Artifact(self.lims, id=id) for id in ids]
 
     def result_files(self):
         """Retreve all resultfiles of output-generation-type perInput."""
-        artifacts = self.all_outputs(unique=True)
-        return [a for a in artifacts if a.output_type == 'ResultFile']
+        ids = self.io_index.output_ids(output_type='ResultFile')
+        return [Artifact(self.lims, id=id) for id in ids]
 
     def analytes(self):
         """Retreving the output Analytes of the process, if existing.
@@ -658,8 +706,8 @@ class Process(Entity):
         analytes are returned. Input/Output is returned as a information string.
         Makes aggregate processes and normal processes look the same."""
         info = 'Output'
-        artifacts = self.all_outputs(unique=True)
-        analytes = [a for a in artifacts if a.type == 'Analyte']
+        ids = self.io_index.output_ids(output_type='Analyte')
+        analytes = [Artifact(self.lims, id=id) for id in ids]
         if len(analytes) == 0:
             artifacts = self.all_inputs(unique=True)
             analytes = [a for a in artifacts if a.type == 'Analyte']
@@ -686,6 +734,7 @@ class Process(Entity):
 
 class ControlType(Entity):
 
+    __slots__ = ()
     _URI = 'controltypes'
 
     supplier = StringDescriptor('supplier')
@@ -699,8 +748,10 @@ class ControlType(Entity):
 class Artifact(Entity):
     "Any process input or output; analyte or file."
 
+    __slots__ = ()
     _URI = 'artifacts'
     _PREFIX = 'art'
+    _BATCH = True
 
     name           = StringDescriptor('name')
     type           = StringDescriptor('type')
@@ -724,9 +775,8 @@ class Artifact(Entity):
         """Returns the input artifact ids of the parrent process."""
         input_artifact_list = []
         try:
-            for tuple in self.parent_process.input_output_maps:
-                if tuple[1]['limsid'] == self.id:
-                    input_artifact_list.append(tuple[0]['uri'])  # ['limsid'])
+            for input in self.parent_process.io_index.inputs(self.id):
+                input_artifact_list.append(input['uri'])  # ['limsid'])
         except:
             pass
         return input_artifact_list
@@ -777,6 +827,8 @@ class AvailableProgram(Entity):
     the step instance. Only represented by a tag in the Step entity, not at its own
     resource."""
 
+    __slots__ = ()
+
     name        = StringAttributeDescriptor('name')
 
     def get(self):
@@ -789,6 +841,8 @@ class AvailableProgram(Entity):
 class StepActions(Entity):
     """Actions associated with a step"""
 
+    __slots__ = ()
+
     def __new__(cls, lims, uri=None, protocolStepID=None):
         if not uri:
             if protocolStepID:
@@ -807,11 +861,9 @@ class StepActions(Entity):
         if not uri:
             uri = lims.get_uri(Step._URI, protocolStepID, 'actions')
         lims.cache[uri] = self
-        lims.cache_list.append(uri)
-        if len(lims.cache_list) > CACHE_N_ENTRIES:
-            del lims.cache[lims.cache_list.pop(0)]
         self.lims = lims
-        self._uri = uri
+        self._set_uri(uri)
+        self._validators = None
         self.root = None
 
     # escalation is not always available for any sample, so it is safer to use try block when
@@ -949,11 +1001,14 @@ class StepActions(Entity):
                 request_node.append(request_comment_node)
             escalation_node.append(request_node)
             self.root.append(escalation_node)
+            invalidate(self)
+            mark_dirty(self)
 
 
 class ProgramStatus(Entity):
     """Status of an EPP script, connected to a Step object"""
 
+    __slots__ = ()
     _URI = None
     _TAG = 'program-status'
 
@@ -969,6 +1024,8 @@ class StepDetails(Entity):
     input-output-maps, fields. In time, the relevant descriptors may be
     generalised to work here too."""
 
+    __slots__ = ()
+
     preset            = StringDescriptor('preset')
 
 
@@ -995,6 +1052,8 @@ class StepPools(Entity):
     This is a temporary measure, it should probably be replaced with a fully
     read/write representation, including creation of pools. """
 
+    __slots__ = ()
+
     pooled_inputs      = ObjectListDescriptor('pool', Pool, 'pooled-inputs')
     available_inputs   = NestedEntityListDescriptor('input', Artifact, 'available-inputs')
 
@@ -1016,11 +1075,12 @@ class StepPools(Entity):
 
 class StepPlacements(Entity):
     """Placements from within a step. Supports POST"""
-    _placementslist = None
+
+    __slots__ = ('_placementslist',)
 
     # [[A,(C,'A:1')][A,(C,'A:2')]] where A is an Artifact and C a Container
     def get_placement_list(self):
-        if not self._placementslist:
+        if not getattr(self, '_placementslist', None):
             # Only fetch the data once.
             self.get()
             self._placementslist = []
@@ -1065,6 +1125,7 @@ class StepPlacements(Entity):
         for cont in containers:
             ElementTree.SubElement(sc, 'container', uri=cont.uri)
         self._placementslist = value
+        mark_dirty(self)
 
     placement_list = property(get_placement_list, set_placement_list)
 
@@ -1084,6 +1145,7 @@ class StepPlacements(Entity):
 
 class ReagentKit(Entity):
     """Type of Reagent with information about the provider"""
+    __slots__ = ()
     _URI = "reagentkits"
     _TAG = "reagent-kit"
     _PREFIX = 'kit'
@@ -1097,6 +1159,7 @@ class ReagentKit(Entity):
 
 class ReagentLot(Entity):
     """Reagent Lots contain information about a particualr lot of reagent used in a step"""
+    __slots__ = ()
     _URI = "reagentlots"
     _TAG = "reagent-lot"
     _PREFIX = 'lot'
@@ -1122,6 +1185,8 @@ class StepReagentLots(Entity):
     because they are available through the reagentlots subentity (this).
     """
 
+    __slots__ = ()
+
     reagent_lots = NestedEntityListDescriptor('reagent-lot', ReagentLot, 'reagent-lots')
 
     def set_reagent_lots(self, lots):
@@ -1138,13 +1203,17 @@ class StepReagentLots(Entity):
 class StepDetails(Entity):
     """Detail associated with a step"""
 
+    __slots__ = ()
+
     input_output_maps = InputOutputMapList('input-output-maps')
+    io_index = InputOutputMapIndexDescriptor('input-output-maps')
     udf = UdfDictionaryDescriptor('fields')
     udt = UdtDictionaryDescriptor('fields')
 
 class Step(Entity):
     "Step, as defined by the genologics API."
 
+    __slots__ = ()
     _URI = 'steps'
     _PREFIX = 'stp'
 
@@ -1173,6 +1242,7 @@ class Step(Entity):
 class ProtocolStep(Entity):
     """Steps key in the Protocol object"""
 
+    __slots__ = ()
     _TAG = 'step'
     # Step config is not resolvable using a URI and an ID alone, because
     # it's nested under a protocol.
@@ -1197,6 +1267,7 @@ class ProtocolStep(Entity):
 
 class Protocol(Entity):
     """Protocol, holding ProtocolSteps and protocol-properties"""
+    __slots__ = ()
     _URI = 'configuration/protocols'
     _TAG = 'protocol'
 
@@ -1208,6 +1279,8 @@ class Protocol(Entity):
 
 class Stage(Entity):
     """Holds Protocol/Workflow"""
+    __slots__ = ()
+
     name     = StringAttributeDescriptor('name')
     index    = IntegerAttributeDescriptor('index')
     protocol = EntityDescriptor('protocol', Protocol)
@@ -1216,6 +1289,7 @@ class Stage(Entity):
 
 class Workflow(Entity):
     """ Workflow, introduced in 3.5"""
+    __slots__ = ()
     _URI = "configuration/workflows"
     _TAG = "workflow"
 
@@ -1229,6 +1303,7 @@ class Queue(Entity):
     """Get the queue of analytes ready to start on a protocol step.
     Give the protocol configuration ID"""
 
+    __slots__ = ()
     _URI = 'queues'
 
     artifacts              = NestedEntityListDescriptor('artifact', Artifact, 'artifacts')
@@ -1237,6 +1312,7 @@ class Queue(Entity):
 
 class ReagentType(Entity):
     """Reagent Type, usually, indexes for sequencing"""
+    __slots__ = ()
     _URI = "reagenttypes"
     _TAG = "reagent-type"
 
@@ -1256,6 +1332,7 @@ class ReagentType(Entity):
 
 class Queue(Entity):
     """Queue of a given step"""
+    __slots__ = ()
     _URI = "queues"
     _TAG= "queue"
     _PREFIX = "que"
@@ -0,0 +1,45 @@
+"""Python interface to GenoLogics LIMS via its REST API.
+
+XML backend used for all parsing and serialization: xml.etree.ElementTree
+from the standard library by default, or lxml.etree when the environment
+variable GENOLOGICS_XML_BACKEND is set to 'lxml' and lxml is installed.
+
+lxml serializes much faster, which helps scripts sending large batch
+updates, but reading elements through its Python proxies makes descriptor
+reads about twice as slow, and it parses only slightly faster.
+
+Elements of the two backends cannot be mixed, so code building XML for
+the entities must use the ElementTree exported here.
+"""
+
+import os
+from io import BytesIO
+
+BACKEND = None
+if os.environ.get('GENOLOGICS_XML_BACKEND', 'stdlib') == 'lxml':
+    try:
+        from lxml import etree as ElementTree
+        BACKEND = 'lxml'
+    except ImportError:
+        pass
+if BACKEND is None:
+    from xml.etree import ElementTree
+    BACKEND = 'stdlib'
+
+
+def fromstring(text):
+    """Parse the XML document in text and return its root element.
+    Text strings are encoded first, since lxml refuses them when they
+    have an encoding declaration."""
+    if not isinstance(text, bytes):
+        text = text.encode('utf-8')
+    return ElementTree.fromstring(text)
+
+
+def tostring(tree):
+    "Return the contents of the ElementTree as a UTF-8 encoded XML string."
+    if BACKEND == 'lxml' and isinstance(tree, ElementTree._ElementTree):
+        return ElementTree.tostring(tree, encoding='utf-8', xml_declaration=True)
+    outfile = BytesIO()
+    tree.write(outfile, encoding='utf-8', xml_declaration=True)
+    return outfile.getvalue()
@@ -12,11 +12,14 @@ __all__ = ['Lab', 'Researcher', 'Project', 'Sample',
            'Containertype', 'Container', 'Processtype', 'Process',
            'Artifact', 'Lims', 'Step', 'Queue', 'File', 'Glsstorage',
            'ReagentLot', 'ReagentKit', 'Workflow', 'ReagentType',
-           'ProtocolStep']
+           'ProtocolStep', 'BatchResult', 'BatchUpdateError']
 
 import os
 import re
-from io import BytesIO
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing.pool import ThreadPool
 import requests
 
 # python 2.7, 3+ compatibility
@@ -25,17 +28,22 @@ from sys import version_info
 if version_info[0] == 2:
     from urlparse import urljoin
     from urllib import urlencode
+    import Queue as queue
 else:
     from urllib.parse import urljoin
     from urllib.parse import urlencode
+    import queue
 
 
 from .entities import *
+from .etree import BACKEND, fromstring, tostring
+from .cache import EntityCache, CACHE_N_ENTRIES
+from .transport import RetryPolicy, RequestGovernor, IDEMPOTENT_METHODS
 
 # Python 2.6 support work-arounds
 # - Exception ElementTree.ParseError does not exist
 # - ElementTree.ElementTree.write does not take arg. xml_declaration
-if version_info[:2] < (2,7):
+if version_info[:2] < (2,7) and BACKEND == 'stdlib':
     from xml.parsers import expat
     ElementTree.ParseError = expat.ExpatError
     p26_write = ElementTree.ElementTree.write
@@ -46,6 +54,39 @@ if version_info[:2] < (2,7):
     ElementTree.ElementTree.write = write_with_xml_declaration
 
 TIMEOUT = 16
+POOL_CONNECTIONS = 100
+POOL_MAXSIZE = 100
+BATCH_SIZE = 500
+MAX_WORKERS = 4
+MAX_URL_LENGTH = 4000
+STREAM_CHUNK_SIZE = 65536
+
+
+class BatchResult(object):
+    """Outcome of a batch update.
+    succeeded: The list of updated instances.
+    failed: The list of tuples (instance, error message) for the instances
+            the server refused to update.
+    """
+
+    def __init__(self):
+        self.succeeded = []
+        self.failed = []
+
+    def __repr__(self):
+        return "BatchResult(%s succeeded, %s failed)" % (len(self.succeeded), len(self.failed))
+
+
+class BatchUpdateError(requests.exceptions.HTTPError):
+    "Raised by Lims.put_batch when some instances were not updated."
+
+    def __init__(self, result):
+        instance, message = result.failed[0]
+        super(BatchUpdateError, self).__init__(
+                "%s of %s instances were not updated, e.g. %s: %s" % (
+                    len(result.failed), len(result.failed) + len(result.succeeded),
+                    instance.id, message))
+        self.result = result
 
 
 class Lims(object):
@@ -53,25 +94,76 @@ class Lims(object):
 
     VERSION = 'v2'
 
-    def __init__(self, baseuri, username, password, version=VERSION):
+    def __init__(self, baseuri, username, password, version=VERSION,
+                 cache_size=CACHE_N_ENTRIES, cache=None, persistent_cache=None,
+                 prefetch_pages=0, batch_size=BATCH_SIZE, max_workers=MAX_WORKERS,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 retry_policy=None, limits=None, max_url_length=MAX_URL_LENGTH):
         """baseuri: Base URI for the GenoLogics server, excluding
                     the 'api' or version parts!
                     For example: https://genologics.scilifelab.se:8443/
         username: The account name of the user to login as.
         password: The password for the user account to login as.
         version: The optional LIMS API version, by default 'v2' 
+        cache_size: The number of entity instances kept in the cache.
+        cache: Optional cache object used instead of the default EntityCache,
+               e.g. genologics.cache.WeakEntityCache(max_elements=...) to bound
+               the memory used by parsed XML while keeping one instance per URI.
+               The caches also take the time to live of each entity class,
+               e.g. EntityCache(ttl={Artifact: 60}); entities with unsaved
+               local changes keep their XML until put() even once expired.
+        persistent_cache: Optional cache of entity XML stored on disk and shared
+               between processes, e.g. genologics.cache.DiskCache(directory,
+               ttl={Processtype: 86400}) for configuration entities.
+        prefetch_pages: The number of pages of list resources fetched ahead
+               by a background thread while the current page is consumed;
+               0 fetches pages one after the other.
+        batch_size: The maximum number of entities sent in one batch request;
+               larger batches are split into several requests.
+        max_workers: The maximum number of requests sent concurrently by the
+               methods that split their work, such as get_batch.
+        pool_connections: The number of hosts for which connections are kept
+               open by the HTTP session.
+        pool_maxsize: The maximum number of connections kept open to a host;
+               should be at least max_workers for threaded scripts.
+        retry_policy: The genologics.transport.RetryPolicy deciding which
+               failed requests are sent again; by default transient errors
+               are retried a few times with exponential backoff.
+               RetryPolicy(retries=0) disables retries.
+        limits: Optional list of genologics.transport.Limit on the rate and
+               concurrency of the requests, per verb and endpoint family,
+               e.g. [Limit('artifacts/batch/*', max_in_flight=2),
+                     Limit('*', rate=10)].
+               The time spent waiting on them is in governor.stats.
+        max_url_length: The maximum length of the URL of list queries; the
+               queries with longer lists of values, e.g. get_processes with
+               many inputartifactlimsid, are split into several requests
+               sent concurrently, and their results are merged.
         """
         self.baseuri = baseuri.rstrip('/') + '/'
         self.username = username
         self.password = password
         self.VERSION = version
-        self.cache = dict()
-        self.cache_list = []
-        # For optimization purposes, enables requests to persist connections
+        if cache is None:
+            cache = EntityCache(cache_size)
+        self.cache = cache
+        self.persistent_cache = persistent_cache
+        self.prefetch_pages = prefetch_pages
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_url_length = max_url_length
+        # All requests go through this session, which keeps connections alive
+        # and reuses TLS sessions for both schemes
         self.request_session = requests.Session()
         # The connection pool has a default size of 10
-        self.adapter = requests.adapters.HTTPAdapter(pool_connections=100, pool_maxsize=100)
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                                     pool_maxsize=pool_maxsize)
         self.request_session.mount('http://', self.adapter)
+        self.request_session.mount('https://', self.adapter)
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        self.governor = RequestGovernor(limits or ())
         # Cache tube Container type, used in create_sample
         self.tube = None
 
@@ -85,16 +177,78 @@ class Lims(object):
 
     def get(self, uri, params=dict()):
         "GET data from the URI. Return the response XML as an ElementTree."
+        r = self._get(uri, params=params, stream=True)
+        return self.parse_response(r)
+
+    def get_validated(self, uri, validators=None):
+        """GET data from the URI, conditionally if validators are given.
+        validators: The 'etag' and 'last-modified' response headers returned
+                    by an earlier call for the same URI.
+        Return the tuple (root, validators). root is None if the server
+        answered 304 Not Modified.
+        """
+        headers = dict(accept='application/xml')
+        if validators:
+            if 'etag' in validators:
+                headers['if-none-match'] = validators['etag']
+            if 'last-modified' in validators:
+                headers['if-modified-since'] = validators['last-modified']
+        r = self._get(uri, headers=headers, stream=True)
+        if r.status_code == 304:
+            self._close(r)
+            return None, validators
+        root = self.parse_response(r)
+        validators = dict((key, r.headers[key]) for key in ('etag', 'last-modified')
+                          if key in r.headers)
+        return root, validators
+
+    def request(self, method, uri, retry=None, **kwargs):
+        """Send a HTTP request with the credentials of this interface,
+        through its session. Return the requests.Response.
+        method: The lower case HTTP verb, e.g. 'get' or 'post'.
+        retry: Whether transient failures are retried according to the
+               retry policy; by default only idempotent methods are retried.
+        The request limits are released once the response headers have been
+        received, also for streamed responses.
+        """
+        # Internal callers streaming the body set _hold_limits to keep the
+        # request limits until they have read it and call _close()
+        hold_limits = kwargs.pop('_hold_limits', False)
+        kwargs.setdefault('auth', (self.username, self.password))
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        send = getattr(self.request_session, method)
+        policy = self.retry_policy
+        policy.request_sent()
+        attempt = 0
+        while True:
+            response = None
+            held = self.governor.acquire(method, uri)
+            try:
+                response = send(uri, **kwargs)
+            except requests.exceptions.RequestException as e:
+                if not (retry and policy.retry(attempt, exception=e)):
+                    raise
+            else:
+                if not (retry and policy.retry(attempt, response=response)):
+                    if hold_limits and isinstance(response, requests.Response):
+                        response._governor_slot, held = held, None
+                    return response
+                response.close()
+            finally:
+                self.governor.release(held)
+            time.sleep(policy.delay(attempt, response))
+            attempt += 1
+
+    def _get(self, uri, params=dict(), headers=None, stream=False):
+        # The session asks for gzip or deflate encoded responses by default
+        kwargs = dict(stream=True, _hold_limits=True) if stream else dict()
         try:
-            r = self.request_session.get(uri, params=params,
-                                         auth=(self.username, self.password),
-                                         headers=dict(accept='application/xml'),
-                                         timeout=TIMEOUT)
+            return self.request('get', uri, params=params,
+                                headers=headers or dict(accept='application/xml'),
+                                timeout=TIMEOUT, **kwargs)
         except requests.exceptions.Timeout as e:
-            raise type(e)("{0}, Error trying to reach {1}".format(e.message, uri))
-
-        else:
-            return self.parse_response(r)
+            raise type(e)("{0}, Error trying to reach {1}".format(e, uri))
 
     def get_file_contents(self, id=None, uri=None):
         """Returns the contents of the file of <ID> or <uri>"""
@@ -105,7 +259,7 @@ class Lims(object):
         else:
             raise ValueError("id or uri required")
         url = urljoin(self.baseuri, '/'.join(segments))
-        r = self.request_session.get(url, auth=(self.username, self.password), timeout=TIMEOUT)
+        r = self.request('get', url, timeout=TIMEOUT)
         self.validate_response(r)
         return r.text
 
@@ -136,8 +290,7 @@ class Lims(object):
 
         # Actually upload the file
         uri = self.get_uri('files', file.id, 'upload')
-        r = requests.post(uri, files={'file': (file_to_upload, open(file_to_upload, 'rb'))},
-                          auth=(self.username, self.password))
+        r = self.request('post', uri, files={'file': (file_to_upload, open(file_to_upload, 'rb'))})
         self.validate_response(r)
         return file
 
@@ -145,25 +298,27 @@ class Lims(object):
         """PUT the serialized XML to the given URI.
         Return the response XML as an ElementTree.
         """
-        r = requests.put(uri, data=data, params=params,
-                         auth=(self.username, self.password),
+        r = self.request('put', uri, data=data, params=params,
                          headers={'content-type': 'application/xml',
                                   'accept': 'application/xml'})
         self.validate_response(r)
 
-    def post(self, uri, data, params=dict()):
+    def post(self, uri, data, params=dict(), retry=False):
         """POST the serialized XML to the given URI.
         Return the response XML as an ElementTree.
+        retry: Whether transient failures are retried. POST is not
+               idempotent, so only set it for requests that can safely be
+               sent twice.
         """
-        r = requests.post(uri, data=data, params=params,
-                          auth=(self.username, self.password),
-                          headers={'content-type': 'application/xml',
-                                   'accept': 'application/xml'})
+        r = self.request('post', uri, retry=retry, data=data, params=params,
+                         stream=True, _hold_limits=True,
+                         headers={'content-type': 'application/xml',
+                                  'accept': 'application/xml'})
         return self.parse_response(r, accept_status_codes=[200, 201, 202])
 
     def delete(self, uri):
         """Issue a HTTP DELETE request."""
-        r = requests.delete(uri, auth=(self.username, self.password))
+        r = self.request('delete', uri)
         if not r.status_code == 204:
             raise requests.exceptions.HTTPError(str(r.content))
 
@@ -172,7 +327,7 @@ class Lims(object):
         does not match any of the versions given for the API.
         """
         uri = urljoin(self.baseuri, 'api')
-        r = requests.get(uri, auth=(self.username, self.password))
+        r = self.request('get', uri)
         root = self.parse_response(r)
         tag = nsmap('ver:versions')
         assert tag == root.tag
@@ -187,7 +342,7 @@ class Lims(object):
         """
         if response.status_code not in accept_status_codes:
             try:
-                root = ElementTree.fromstring(response.content)
+                root = fromstring(response.content)
                 node = root.find('message')
                 if node is None:
                     response.raise_for_status()
@@ -206,10 +361,32 @@ class Lims(object):
         """Parse the XML returned in the response.
         Raise an HTTP error if the response status is not 200.
         """
+        if isinstance(response, requests.Response) and not response._content_consumed:
+            return self._parse_stream(response, accept_status_codes)
         self.validate_response(response, accept_status_codes)
-        root = ElementTree.fromstring(response.content)
+        root = fromstring(response.content)
         return root
 
+    def _parse_stream(self, response, accept_status_codes=[200]):
+        """Parse the XML of a streamed response while it is downloaded,
+        without holding the whole body in memory."""
+        parser = ElementTree.XMLParser()
+        try:
+            self.validate_response(response, accept_status_codes)
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+            return parser.close()
+        finally:
+            self._close(response)
+
+    def _close(self, response):
+        """Close a streamed response and release the request limits held
+        until its body was read."""
+        try:
+            response.close()
+        finally:
+            self.governor.release(vars(response).pop('_governor_slot', None))
+
     def get_udfs(self, name=None, attach_to_name=None, attach_to_category=None, start_index=None, add_info=False):
         """Get a list of udfs, filtered by keyword arguments.
         name: name of udf
@@ -219,20 +396,19 @@ class Lims(object):
              then you need to set attach_to_category='ProcessType'. Must not be provided otherwise.
         start_index: Page to retrieve; all if None.
         """
+        return self._collect(self.iter_udfs(name=name,
+                                            attach_to_name=attach_to_name,
+                                            attach_to_category=attach_to_category,
+                                            start_index=start_index,
+                                            add_info=add_info), add_info)
+
+    def iter_udfs(self, name=None, attach_to_name=None, attach_to_category=None, start_index=None, add_info=False):
+        "Iterate over udfs one page at a time; see get_udfs for the arguments."
         params = self._get_params(name=name,
                                   attach_to_name=attach_to_name,
                                   attach_to_category=attach_to_category,
                                   start_index=start_index)
-        return self._get_instances(Udfconfig, add_info=add_info, params=params)
-
-    def get_reagent_types(self, name=None, start_index=None):
-        """Get a list of reqgent types, filtered by keyword arguments.
-        name: reagent type  name, or list of names.
-        start_index: Page to retrieve; all if None.
-        """
-        params = self._get_params(name=name,
-                                  start_index=start_index)
-        return self._get_instances(ReagentType, params=params)
+        return self._iter_instances(Udfconfig, add_info=add_info, params=params)
 
     def get_labs(self, name=None, last_modified=None,
                  udf=dict(), udtname=None, udt=dict(), start_index=None, add_info=False):
@@ -245,11 +421,20 @@ class Lims(object):
              and a string or list of strings as value.
         start_index: Page to retrieve; all if None.
         """
+        return self._collect(self.iter_labs(name=name,
+                                            last_modified=last_modified,
+                                            udf=udf, udtname=udtname, udt=udt,
+                                            start_index=start_index,
+                                            add_info=add_info), add_info)
+
+    def iter_labs(self, name=None, last_modified=None,
+                  udf=dict(), udtname=None, udt=dict(), start_index=None, add_info=False):
+        "Iterate over labs one page at a time; see get_labs for the arguments."
         params = self._get_params(name=name,
                                   last_modified=last_modified,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        return self._get_instances(Lab, add_info=add_info, params=params)
+        return self._iter_instances(Lab, add_info=add_info, params=params)
 
     def get_researchers(self, firstname=None, lastname=None, username=None,
                         last_modified=None,
@@ -266,13 +451,26 @@ class Lims(object):
              and a string or list of strings as value.
         start_index: Page to retrieve; all if None.
         """
+        return self._collect(self.iter_researchers(firstname=firstname,
+                                                   lastname=lastname,
+                                                   username=username,
+                                                   last_modified=last_modified,
+                                                   udf=udf, udtname=udtname, udt=udt,
+                                                   start_index=start_index,
+                                                   add_info=add_info), add_info)
+
+    def iter_researchers(self, firstname=None, lastname=None, username=None,
+                         last_modified=None,
+                         udf=dict(), udtname=None, udt=dict(), start_index=None,
+                         add_info=False):
+        "Iterate over researchers one page at a time; see get_researchers for the arguments."
         params = self._get_params(firstname=firstname,
                                   lastname=lastname,
                                   username=username,
                                   last_modified=last_modified,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        return self._get_instances(Researcher, add_info=add_info, params=params)
+        return self._iter_instances(Researcher, add_info=add_info, params=params)
 
     def get_projects(self, name=None, open_date=None, last_modified=None,
                      udf=dict(), udtname=None, udt=dict(), start_index=None,
@@ -287,12 +485,23 @@ class Lims(object):
              and a string or list of strings as value.
         start_index: Page to retrieve; all if None.
         """
+        return self._collect(self.iter_projects(name=name,
+                                                open_date=open_date,
+                                                last_modified=last_modified,
+                                                udf=udf, udtname=udtname, udt=udt,
+                                                start_index=start_index,
+                                                add_info=add_info), add_info)
+
+    def iter_projects(self, name=None, open_date=None, last_modified=None,
+                      udf=dict(), udtname=None, udt=dict(), start_index=None,
+                      add_info=False):
+        "Iterate over projects one page at a time; see get_projects for the arguments."
         params = self._get_params(name=name,
                                   open_date=open_date,
                                   last_modified=last_modified,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        return self._get_instances(Project, add_info=add_info, params=params)
+        return self._iter_instances(Project, add_info=add_info, params=params)
 
     def get_sample_number(self, name=None, projectname=None, projectlimsid=None,
                           udf=dict(), udtname=None, udt=dict(), start_index=None):
@@ -303,13 +512,9 @@ class Lims(object):
                                   projectlimsid=projectlimsid,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        root = self.get(self.get_uri(Sample._URI), params=params)
         total = 0
-        while params.get('start-index') is None:  # Loop over all pages.
+        for root in self._iter_pages(self.get_uri(Sample._URI), params):
             total += len(root.findall("sample"))
-            node = root.find('next-page')
-            if node is None: break
-            root = self.get(node.attrib['uri'], params=params)
         return total
 
     def get_samples(self, name=None, projectname=None, projectlimsid=None,
@@ -324,12 +529,21 @@ class Lims(object):
              and a string or list of strings as value.
         start_index: Page to retrieve; all if None.
         """
+        return list(self.iter_samples(name=name,
+                                      projectname=projectname,
+                                      projectlimsid=projectlimsid,
+                                      udf=udf, udtname=udtname, udt=udt,
+                                      start_index=start_index))
+
+    def iter_samples(self, name=None, projectname=None, projectlimsid=None,
+                     udf=dict(), udtname=None, udt=dict(), start_index=None):
+        "Iterate over samples one page at a time; see get_samples for the arguments."
         params = self._get_params(name=name,
                                   projectname=projectname,
                                   projectlimsid=projectlimsid,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        return self._get_instances(Sample, params=params)
+        return self._iter_instances(Sample, params=params)
 
     def get_artifacts(self, name=None, type=None, process_type=None,
                       artifact_flag_name=None, working_flag=None, qc_flag=None,
@@ -356,6 +570,31 @@ class Lims(object):
              and a string or list of strings as value.
         start_index: Page to retrieve; all if None.
         """
+        artifacts = list(self.iter_artifacts(name=name,
+                                             type=type,
+                                             process_type=process_type,
+                                             artifact_flag_name=artifact_flag_name,
+                                             working_flag=working_flag,
+                                             qc_flag=qc_flag,
+                                             sample_name=sample_name,
+                                             samplelimsid=samplelimsid,
+                                             artifactgroup=artifactgroup,
+                                             containername=containername,
+                                             containerlimsid=containerlimsid,
+                                             reagent_label=reagent_label,
+                                             udf=udf, udtname=udtname, udt=udt,
+                                             start_index=start_index))
+        if resolve:
+            return self.get_batch(artifacts)
+        else:
+            return artifacts
+
+    def iter_artifacts(self, name=None, type=None, process_type=None,
+                       artifact_flag_name=None, working_flag=None, qc_flag=None,
+                       sample_name=None, samplelimsid=None, artifactgroup=None, containername=None,
+                       containerlimsid=None, reagent_label=None,
+                       udf=dict(), udtname=None, udt=dict(), start_index=None):
+        "Iterate over artifacts one page at a time; see get_artifacts for the arguments."
         params = self._get_params(name=name,
                                   type=type,
                                   process_type=process_type,
@@ -370,10 +609,7 @@ class Lims(object):
                                   reagent_label=reagent_label,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        if resolve:
-            return self.get_batch(self._get_instances(Artifact, params=params))
-        else:
-            return self._get_instances(Artifact, params=params)
+        return self._iter_instances(Artifact, params=params)
 
     def get_containers(self, name=None, type=None,
                        state=None, last_modified=None,
@@ -390,17 +626,33 @@ class Lims(object):
              and a string or list of strings as value.
         start_index: Page to retrieve; all if None.
         """
+        return self._collect(self.iter_containers(name=name,
+                                                  type=type,
+                                                  state=state,
+                                                  last_modified=last_modified,
+                                                  udf=udf, udtname=udtname, udt=udt,
+                                                  start_index=start_index,
+                                                  add_info=add_info), add_info)
+
+    def iter_containers(self, name=None, type=None,
+                        state=None, last_modified=None,
+                        udf=dict(), udtname=None, udt=dict(), start_index=None,
+                        add_info=False):
+        "Iterate over containers one page at a time; see get_containers for the arguments."
         params = self._get_params(name=name,
                                   type=type,
                                   state=state,
                                   last_modified=last_modified,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        return self._get_instances(Container, add_info=add_info, params=params)
+        return self._iter_instances(Container, add_info=add_info, params=params)
 
     def get_container_types(self, name):
+        return list(self.iter_container_types(name))
+
+    def iter_container_types(self, name):
         params = self._get_params(name=name)
-        return self._get_instances(Containertype, params=params)
+        return self._iter_instances(Containertype, params=params)
 
     def get_processes(self, last_modified=None, type=None,
                       inputartifactlimsid=None,
@@ -419,6 +671,20 @@ class Lims(object):
         projectname: Name of project, or list of.
         start_index: Page to retrieve; all if None.
         """
+        return list(self.iter_processes(last_modified=last_modified,
+                                        type=type,
+                                        inputartifactlimsid=inputartifactlimsid,
+                                        techfirstname=techfirstname,
+                                        techlastname=techlastname,
+                                        projectname=projectname,
+                                        udf=udf, udtname=udtname, udt=udt,
+                                        start_index=start_index))
+
+    def iter_processes(self, last_modified=None, type=None,
+                       inputartifactlimsid=None,
+                       techfirstname=None, techlastname=None, projectname=None,
+                       udf=dict(), udtname=None, udt=dict(), start_index=None):
+        "Iterate over processes one page at a time; see get_processes for the arguments."
         params = self._get_params(last_modified=last_modified,
                                   type=type,
                                   inputartifactlimsid=inputartifactlimsid,
@@ -427,35 +693,59 @@ class Lims(object):
                                   projectname=projectname,
                                   start_index=start_index)
         params.update(self._get_params_udf(udf=udf, udtname=udtname, udt=udt))
-        return self._get_instances(Process, params=params)
+        return self._iter_instances(Process, params=params)
 
     def get_workflows(self, name=None, add_info=False):
         """Get the list of existing workflows on the system """
+        return self._collect(self.iter_workflows(name=name, add_info=add_info), add_info)
+
+    def iter_workflows(self, name=None, add_info=False):
         params = self._get_params(name=name)
-        return self._get_instances(Workflow, add_info=add_info, params=params)
+        return self._iter_instances(Workflow, add_info=add_info, params=params)
 
     def get_process_types(self, displayname=None, add_info=False):
         """Get a list of process types with the specified name."""
+        return self._collect(self.iter_process_types(displayname=displayname, add_info=add_info), add_info)
+
+    def iter_process_types(self, displayname=None, add_info=False):
         params = self._get_params(displayname=displayname)
-        return self._get_instances(Processtype, add_info=add_info, params=params)
+        return self._iter_instances(Processtype, add_info=add_info, params=params)
 
-    def get_reagent_types(self, name=None, add_info=False):
-        params = self._get_params(name=name)
-        return self._get_instances(ReagentType, add_info=add_info, params=params)
+    def get_reagent_types(self, name=None, add_info=False, start_index=None):
+        """Get a list of reqgent types, filtered by keyword arguments.
+        name: reagent type  name, or list of names.
+        start_index: Page to retrieve; all if None.
+        """
+        return self._collect(self.iter_reagent_types(name=name,
+                                                     start_index=start_index,
+                                                     add_info=add_info), add_info)
+
+    def iter_reagent_types(self, name=None, add_info=False, start_index=None):
+        params = self._get_params(name=name,
+                                  start_index=start_index)
+        return self._iter_instances(ReagentType, add_info=add_info, params=params)
 
     def get_protocols(self, name=None, add_info=False):
         """Get the list of existing protocols on the system """
+        return self._collect(self.iter_protocols(name=name, add_info=add_info), add_info)
+
+    def iter_protocols(self, name=None, add_info=False):
         params = self._get_params(name=name)
-        return self._get_instances(Protocol, add_info=add_info, params=params)
+        return self._iter_instances(Protocol, add_info=add_info, params=params)
 
     def get_reagent_kits(self, name=None, start_index=None, add_info=False):
         """Get a list of reagent kits, filtered by keyword arguments.
         name: reagent kit  name, or list of names.
         start_index: Page to retrieve; all if None.
         """
+        return self._collect(self.iter_reagent_kits(name=name,
+                                                    start_index=start_index,
+                                                    add_info=add_info), add_info)
+
+    def iter_reagent_kits(self, name=None, start_index=None, add_info=False):
         params = self._get_params(name=name,
                                   start_index=start_index)
-        return self._get_instances(ReagentKit, add_info=add_info, params=params)
+        return self._iter_instances(ReagentKit, add_info=add_info, params=params)
 
     def get_reagent_lots(self, name=None, kitname=None, number=None,
                          start_index=None):
@@ -465,9 +755,14 @@ class Lims(object):
         number: lot number or list of lot number
         start_index: Page to retrieve; all if None.
         """
+        return list(self.iter_reagent_lots(name=name, kitname=kitname, number=number,
+                                           start_index=start_index))
+
+    def iter_reagent_lots(self, name=None, kitname=None, number=None,
+                          start_index=None):
         params = self._get_params(name=name, kitname=kitname, number=number,
                                   start_index=start_index)
-        return self._get_instances(ReagentLot, params=params)
+        return self._iter_instances(ReagentLot, params=params)
 
     def _get_params(self, **kwargs):
         "Convert keyword arguments to a kwargs dictionary."
@@ -488,33 +783,181 @@ class Lims(object):
             result["udt.%s" % key] = value
         return result
 
-    def _get_instances(self, klass, add_info=None, params=dict()):
-        results = []
-        additionnal_info_dicts = []
-        tag = klass._TAG
-        if tag is None:
-            tag = klass.__name__.lower()
-        root = self.get(self.get_uri(klass._URI), params=params)
-        while params.get('start-index') is None:  # Loop over all pages.
-            for node in root.findall(tag):
-                results.append(klass(self, uri=node.attrib['uri']))
-                info_dict = {}
-                for attrib_key in node.attrib:
-                    info_dict[attrib_key] = node.attrib['uri']
-                for subnode in node:
-                    info_dict[subnode.tag] = subnode.text
-                additionnal_info_dicts.append(info_dict)
+    def _split_params(self, uri, params):
+        """Return the list of params dictionaries of the queries needed to
+        keep the URLs within max_url_length. The values of the longest
+        multi-valued parameter are spread over several queries, and the
+        other ones too if that is not enough."""
+        budget = self.max_url_length - len(uri) - 1
+        if len(urlencode(params, doseq=True)) <= budget:
+            return [params]
+        multi = [key for key, value in params.items()
+                 if isinstance(value, (list, tuple)) and len(value) > 1]
+        if not multi:
+            return [params]
+        key = max(multi, key=lambda key: len(urlencode({key: params[key]}, doseq=True)))
+        rest = dict(params)
+        del rest[key]
+        base = len(urlencode(rest, doseq=True)) + 1
+        chunks = [[]]
+        size = base
+        for value in params[key]:
+            length = len(urlencode({key: value})) + 1
+            if chunks[-1] and size + length > budget:
+                chunks.append([])
+                size = base
+            chunks[-1].append(value)
+            size += length
+        result = []
+        for chunk in chunks:
+            query = dict(rest)
+            query[key] = chunk
+            result.extend(self._split_params(uri, query))
+        return result
+
+    def _iter_pages_split(self, uri, queries):
+        """Yield the pages of several queries of a list resource, query after
+        query. Up to max_workers queries are fetched at once by background
+        threads, each up to prefetch_pages (at least one) pages ahead of the
+        caller."""
+        if self.max_workers <= 1:
+            for params in queries:
+                for root in self._iter_pages_serial(uri, params):
+                    yield root
+            return
+        depth = self.prefetch_pages or 1
+        pending = deque(queries)
+        running = deque()
+        try:
+            while pending or running:
+                while pending and len(running) < self.max_workers:
+                    running.append(self._fetch_ahead(uri, pending.popleft(), depth))
+                for root in self._read_ahead(running[0][0]):
+                    yield root
+                running.popleft()
+        finally:
+            for pages, stop in running:
+                stop.set()
+
+    def _iter_pages(self, uri, params=dict()):
+        """Return an iterator over the XML root of each page of a list resource.
+        Only the requested page is fetched if params has a start-index."""
+        if self.prefetch_pages and params.get('start-index') is None:
+            return self._iter_pages_ahead(uri, params, self.prefetch_pages)
+        return self._iter_pages_serial(uri, params)
+
+    def _iter_pages_ahead(self, uri, params, depth):
+        """Yield the pages of a list resource, fetched by a background thread
+        up to depth pages ahead of the caller."""
+        pages, stop = self._fetch_ahead(uri, params, depth)
+        try:
+            for root in self._read_ahead(pages):
+                yield root
+        finally:
+            stop.set()
+
+    def _fetch_ahead(self, uri, params, depth):
+        """Start a background thread putting the pages of a list resource in
+        a queue of up to depth pages. Return the queue, to be read with
+        _read_ahead, and the event stopping the thread."""
+        pages = queue.Queue(maxsize=depth)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def fetch():
+            try:
+                for root in self._iter_pages_serial(uri, params):
+                    if not put((root, None)):
+                        return
+            except Exception as e:
+                put((None, e))
+            else:
+                put((None, None))
+
+        thread = threading.Thread(target=fetch)
+        thread.daemon = True
+        thread.start()
+        return pages, stop
+
+    def _read_ahead(self, pages):
+        "Yield the pages put in the queue by _fetch_ahead, raising its errors."
+        while True:
+            root, error = pages.get()
+            if error is not None:
+                raise error
+            if root is None:
+                return
+            yield root
+
+    def _iter_pages_serial(self, uri, params=dict()):
+        root = self.get(uri, params=params)
+        while True:
+            yield root
+            if params.get('start-index') is not None: break
             node = root.find('next-page')
             if node is None: break
             root = self.get(node.attrib['uri'], params=params)
-        if add_info:
-            return results, additionnal_info_dicts
+
+    def _iter_instances(self, klass, add_info=None, params=dict()):
+        """Yield the instances of klass in a list resource, one page at a time.
+        If add_info is true, yield tuples (instance, additional info dictionary).
+        Queries too long for one URL are split, and the instances found by
+        several of them are yielded once."""
+        tag = klass._TAG
+        if tag is None:
+            tag = klass.__name__.lower()
+        uri = self.get_uri(klass._URI)
+        queries = self._split_params(uri, params)
+        if len(queries) == 1:
+            roots = self._iter_pages(uri, params)
+            seen = None
         else:
-            return results
+            roots = self._iter_pages_split(uri, queries)
+            seen = set()
+        for root in roots:
+            for node in root.findall(tag):
+                if seen is not None:
+                    if node.attrib['uri'] in seen: continue
+                    seen.add(node.attrib['uri'])
+                instance = klass(self, uri=node.attrib['uri'])
+                if add_info:
+                    info_dict = {}
+                    for attrib_key in node.attrib:
+                        info_dict[attrib_key] = node.attrib['uri']
+                    for subnode in node:
+                        info_dict[subnode.tag] = subnode.text
+                    yield instance, info_dict
+                else:
+                    yield instance
+
+    def _collect(self, instances, add_info=None):
+        "Return the list of instances, and of info dictionaries if add_info is true."
+        if not add_info:
+            return list(instances)
+        results = []
+        additionnal_info_dicts = []
+        for instance, info_dict in instances:
+            results.append(instance)
+            additionnal_info_dicts.append(info_dict)
+        return results, additionnal_info_dicts
+
+    def _get_instances(self, klass, add_info=None, params=dict()):
+        return self._collect(self._iter_instances(klass, add_info=add_info, params=params), add_info)
 
-    def get_batch(self, instances, force=False):
+    def get_batch(self, instances, force=False, chunk_size=None, max_workers=None):
         """Get the content of a set of instances using the efficient batch call.
 
+        The instances are retrieved in chunks of chunk_size (default batch_size)
+        sent concurrently by up to max_workers (default max_workers) threads.
+
         Returns the list of requested instances in arbitrary order, with duplicates removed
         (duplicates=entities occurring more than once in the instances argument).
 
@@ -530,46 +973,131 @@ class Lims(object):
         """
         if not instances:
             return []
-        root = ElementTree.Element(nsmap('ri:links'))
-        needs_request = False
+        links = []
         instance_map = {}
         for instance in instances:
             instance_map[instance.id] = instance
             if force or instance.root is None:
-                ElementTree.SubElement(root, 'link', dict(uri=instance.uri,
-                                                          rel=instance.__class__._URI))
-                needs_request = True
+                links.append(instance)
 
-        if needs_request:
+        if links:
             uri = self.get_uri(instance.__class__._URI, 'batch/retrieve')
-            data = self.tostring(ElementTree.ElementTree(root))
-            root = self.post(uri, data)
-            for node in root.getchildren():
-                instance = instance_map[node.attrib['limsid']]
-                instance.root = node
-        return instance_map.values()
 
-    def put_batch(self, instances):
-        """Update multiple instances using a single batch request."""
+            def retrieve(chunk):
+                root = ElementTree.Element(nsmap('ri:links'))
+                for instance in chunk:
+                    ElementTree.SubElement(root, 'link', dict(uri=instance.uri,
+                                                              rel=instance.__class__._URI))
+                return self.post(uri, self.tostring(ElementTree.ElementTree(root)), retry=True)
+
+            for root in self._map_concurrent(retrieve, self._chunks(links, chunk_size), max_workers):
+                for node in root:
+                    instance = instance_map[node.attrib['limsid']]
+                    instance.root = node
+        return instance_map.values()
 
-        if not instances:
-            return
+    def resolve(self, instances, force=False, max_workers=None):
+        """Get the content of a list of instances of any classes in bulk.
 
-        root = None  # XML root element for batch request
+        The instances are grouped by class. Classes supported by the batch API
+        are retrieved with get_batch, the others with single GET requests sent
+        concurrently by up to max_workers (default max_workers) threads.
 
+        Returns the list of instances in their original order, with duplicates removed.
+        """
+        unique = OrderedDict()
         for instance in instances:
-            if root is None:
-                klass = instance.__class__
-                # Tag is art:details, con:details, etc.
-                example_root = instance.root
-                ns_uri = re.match("{(.*)}.*", example_root.tag).group(1)
-                root = ElementTree.Element("{%s}details" % (ns_uri))
-
-            root.append(instance.root)
+            unique.setdefault((instance.__class__, instance.uri), instance)
+        groups = OrderedDict()
+        for (klass, uri), instance in unique.items():
+            groups.setdefault(klass, []).append(instance)
+        for klass, group in groups.items():
+            if klass._BATCH:
+                self.get_batch(group, force=force, max_workers=max_workers)
+            else:
+                self._map_concurrent(lambda instance: instance.get(force=force), group, max_workers)
+        return list(unique.values())
+
+    def udf_frame(self, entities, fields=None, format='pandas'):
+        """Return the UDF values of the entities as typed columns, one row
+        per entity, e.g. a pandas DataFrame of artifacts x UDFs. The entities
+        are first loaded in bulk with resolve(), and their udf:field elements
+        are converted per column by numpy according to the UDF type.
+        See genologics.columnar.udf_frame for the fields and format arguments.
+        """
+        from .columnar import udf_frame
+        return udf_frame(self.resolve(entities), fields=fields, format=format)
+
+    def _chunks(self, items, chunk_size=None):
+        "Split the list items into lists of at most chunk_size (default batch_size) items."
+        chunk_size = chunk_size or self.batch_size
+        return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    def _map_concurrent(self, func, items, max_workers=None):
+        """Return the list of func(item) for each item, calling func from up to
+        max_workers (default self.max_workers) threads at a time."""
+        workers = min(max_workers or self.max_workers, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        pool = ThreadPool(workers)
+        try:
+            return pool.map(func, items)
+        finally:
+            pool.close()
+            pool.join()
+
+    def put_batch(self, instances, chunk_size=None, max_workers=None, raise_on_error=True):
+        """Update multiple instances using batch requests.
+
+        The instances are sent in chunks of chunk_size (default batch_size)
+        by up to max_workers (default max_workers) threads. The server rejects
+        a batch update as a whole, so a chunk rejected as invalid (status 400)
+        is split in halves and sent again until the instances causing the
+        error are isolated. Any other error, e.g. 401 or 503, fails the whole
+        chunk at once.
+
+        Returns a BatchResult listing the updated instances and the failed
+        ones with the error message of the server. If raise_on_error is true
+        and any instance failed, a BatchUpdateError holding this result is
+        raised instead.
+        """
+        result = BatchResult()
+        instances = list(instances)
+        if not instances:
+            return result
 
+        for instance in instances:
+            if instance.root is None:
+                raise ValueError("%r has no XML data to save; it was not loaded" % instance)
+        klass = instances[0].__class__
+        # Tag is art:details, con:details, etc.
+        ns_uri = re.match("{(.*)}.*", instances[0].root.tag).group(1)
         uri = self.get_uri(klass._URI, 'batch/update')
-        data = self.tostring(ElementTree.ElementTree(root))
-        root = self.post(uri, data)
+
+        def update(chunk):
+            root = ElementTree.Element("{%s}details" % (ns_uri))
+            for instance in chunk:
+                root.append(instance.root)
+            try:
+                self.post(uri, self.tostring(ElementTree.ElementTree(root)), retry=True)
+            except requests.exceptions.HTTPError as e:
+                status = getattr(e.response, 'status_code', None)
+                if status != 400 or len(chunk) == 1:
+                    return [], [(instance, str(e)) for instance in chunk]
+                half = len(chunk) // 2
+                succeeded, failed = update(chunk[:half])
+                succeeded2, failed2 = update(chunk[half:])
+                return succeeded + succeeded2, failed + failed2
+            return chunk, []
+
+        for succeeded, failed in self._map_concurrent(update, self._chunks(instances, chunk_size), max_workers):
+            for instance in succeeded:
+                instance._dirty = False
+            result.succeeded.extend(succeeded)
+            result.failed.extend(failed)
+        if result.failed and raise_on_error:
+            raise BatchUpdateError(result)
+        return result
 
     def route_artifacts(self, artifact_list, workflow_uri=None, stage_uri=None, unassign=False):
         root = ElementTree.Element(nsmap('rt:routing'))
@@ -586,17 +1114,14 @@ class Lims(object):
             a.set('uri', artifact.uri)
 
         uri = self.get_uri('route', 'artifacts')
-        r = requests.post(uri, data=self.tostring(ElementTree.ElementTree(root)),
-                          auth=(self.username, self.password),
-                          headers={'content-type': 'application/xml',
-                                   'accept': 'application/xml'})
+        r = self.request('post', uri, data=self.tostring(ElementTree.ElementTree(root)),
+                         headers={'content-type': 'application/xml',
+                                  'accept': 'application/xml'})
         self.validate_response(r)
 
     def tostring(self, etree):
         "Return the ElementTree contents as a UTF-8 encoded XML string."
-        outfile = BytesIO()
-        self.write(outfile, etree)
-        return outfile.getvalue()
+        return tostring(etree)
 
     def write(self, outfile, etree):
         "Write the ElementTree contents as UTF-8 encoded XML to the open file."
@@ -606,7 +1131,7 @@ class Lims(object):
         """Creates a new protocol step instance. The inputs parameter is a list of 
 		artifact inputs. Returns the new step."""
 		
-        root = ElementTree.Element('stp:step-creation', {'xmlns:stp': 'http://genologics.com/ri/step'})
+        root = ElementTree.Element(nsmap('stp:step-creation'))
         ElementTree.SubElement(root, "configuration", {'uri': step_configuration.uri})
         inputs_element = ElementTree.SubElement(root, "inputs")
         for i in inputs:
@@ -625,7 +1150,7 @@ class Lims(object):
 
     def create_lot(self, reagent_kit, name, lot_number=None, expiry_date=None,
             storage_location=None, notes=None, status=None):
-        root = ElementTree.Element("lot:reagent-lot", {"xmlns:lot": "http://genologics.com/ri/reagentlot"})
+        root = ElementTree.Element(nsmap('lot:reagent-lot'))
         ElementTree.SubElement(root, 'reagent-kit', {'uri': reagent_kit.uri})
         ElementTree.SubElement(root, 'name').text = name
         if lot_number:
@@ -648,13 +1173,11 @@ class Lims(object):
         """Create a project, specifying only the required information.
 
         Returns a new Project object."""
-        root = ElementTree.Element('prj:project', {'xmlns:prj': 'http://genologics.com/ri/project'})
+        root = ElementTree.Element(nsmap('prj:project'))
         ElementTree.SubElement(root, 'name').text = name
         ElementTree.SubElement(root, 'researcher', {'uri': researcher.uri})
         for k, v in udf.items():
-            ElementTree.SubElement(root, 'udf:field',
-                    {'xmlns:udf': 'http://genologics.com/ri/userdefined', 'name': k}
-                    ).text = str(v)
+            ElementTree.SubElement(root, nsmap('udf:field'), {'name': k}).text = str(v)
         if open_date:
             ElementTree.SubElement(root, 'open-date').text = str(open_date)
         xml_data = self.tostring(ElementTree.ElementTree(root))
@@ -664,7 +1187,7 @@ class Lims(object):
         return project
 
     def create_container(self, type, name=None):
-        root = ElementTree.Element('con:container', {'xmlns:con': 'http://genologics.com/ri/container'})
+        root = ElementTree.Element(nsmap('con:container'))
         ElementTree.SubElement(root, 'type', {'uri': type.uri})
         if name:
             ElementTree.SubElement(root, 'name').text = name
@@ -676,7 +1199,7 @@ class Lims(object):
 
     def create_sample(self, name, project, container=None, well=None, udf={}):
         """Create a sample.  Returns a new Sample object."""
-        root = ElementTree.Element('smp:samplecreation', {'xmlns:smp': 'http://genologics.com/ri/sample'})
+        root = ElementTree.Element(nsmap('smp:samplecreation'))
         ElementTree.SubElement(root, 'name').text = name
         ElementTree.SubElement(root, 'project', {'uri': project.uri})
         create_container = container is None
@@ -689,9 +1212,7 @@ class Lims(object):
         ElementTree.SubElement(location, 'container', {'uri': container.uri})
         ElementTree.SubElement(location, 'value').text = well
         for k, v in udf.items():
-            ElementTree.SubElement(root, 'udf:field',
-                    {'xmlns:udf': 'http://genologics.com/ri/userdefined', 'name': k}
-                    ).text = str(v)
+            ElementTree.SubElement(root, nsmap('udf:field'), {'name': k}).text = str(v)
         xml_data = self.tostring(ElementTree.ElementTree(root))
         try:
             response = self.post(self.get_uri("samples"), xml_data)
@@ -724,7 +1245,7 @@ class Lims(object):
     def route_analytes(self, analytes, target):
         """Adding analytes to workflow or stage (target)."""
 
-        root = ElementTree.Element('rt:routing', {'xmlns:rt': 'http://genologics.com/ri/routing'})
+        root = ElementTree.Element(nsmap('rt:routing'))
         if isinstance(target, Workflow):
             assign = ElementTree.SubElement(root, "assign", {'workflow-uri': target.uri})
         elif isinstance(target, Stage):
@@ -761,11 +1282,12 @@ class Lims(object):
 
         step.actions.put()
 
-    def get_qc_results(self, analytes, qc_process_name):
+    def get_qc_results(self, analytes, qc_process_name, resolve=False):
         """Get QC results for a list of analytes, from a process which produces 
         ResultFiles, which had the specified analytes directly as inputs.
 
         qc_process_name: The name of the QC process to get results from.
+        resolve: Get the content of the QC results in bulk before returning them.
 
         Returns the QC results (ResultFile artifacts) in the same order as
         the input list of analytes.
@@ -777,24 +1299,17 @@ class Lims(object):
                 inputartifactlimsid=[a.id for a in analytes],
                 type=qc_process_name
                 )
+        return self._latest_qc_results(analytes, self.resolve(qc_processes), resolve)
 
-        qc_results = {}
-        # Uses most recent QC result for each sample
-        for qc_process in sorted(qc_processes, key=lambda x: x.date_run):
-            for i, o in qc_process.input_output_maps:
-                if o and o['output-type'] == "ResultFile" and o['output-generation-type'] == 'PerInput':
-                    qc_results[i['uri'].id] = o['uri']
-
-        return [qc_results[a.id] for a in analytes]
 
-
-    def get_qc_results_re(self, analytes, qc_process_re):
+    def get_qc_results_re(self, analytes, qc_process_re, resolve=False):
         """Get QC results for a list of analytes, from a process which produces 
         ResultFiles, which had the specified analytes directly as inputs.
 
         qc_process_re: A regular expression used to match the process name. The
                  re.match() function is used, so the regex has to match the beginning
                  of the name.
+        resolve: Get the content of the QC results in bulk before returning them.
 
         Returns the QC results (ResultFile artifacts) in the same order as
         the input list of analytes.
@@ -805,15 +1320,31 @@ class Lims(object):
         qc_processes = self.get_processes(
                 inputartifactlimsid=[a.id for a in analytes]
                 )
-
+        qc_processes = [p for p in self.resolve(qc_processes) if re.match(qc_process_re, p.type_name)]
+        return self._latest_qc_results(analytes, qc_processes, resolve)
+
+    def _latest_qc_results(self, analytes, qc_processes, resolve=False):
+        """Return the PerInput ResultFile of the most recent of the loaded
+        qc_processes for each analyte, in the order of the analytes.
+        The processes are visited from the most recent one, until every
+        analyte has a result."""
+        missing = set(a.id for a in analytes)
         qc_results = {}
-        # Uses most recent QC result for each sample
-        for qc_process in sorted(qc_processes, key=lambda x: x.date_run):
-            if re.match(qc_process_re, qc_process.type_name):
-                for i, o in qc_process.input_output_maps:
-                    if o and o['output-type'] == "ResultFile" and o['output-generation-type'] == 'PerInput':
-                        qc_results[i['uri'].id] = o['uri']
-
-        return [qc_results[a.id] for a in analytes]
+        for qc_process in reversed(sorted(qc_processes, key=lambda x: x.date_run)):
+            io_index = qc_process.io_index
+            for id in io_index.input_ids():
+                if id not in missing:
+                    continue
+                outputs = io_index.outputs(id, output_type='ResultFile', generation_type='PerInput')
+                if outputs:
+                    qc_results[id] = outputs[-1]['uri']
+                    missing.discard(id)
+            if not missing:
+                break
+
+        results = [qc_results[a.id] for a in analytes]
+        if resolve:
+            self.resolve(results)
+        return results
 
 
@@ -0,0 +1,217 @@
+"""Python interface to GenoLogics LIMS via its REST API.
+
+Lineage graph of the artifacts of a sample, used to build its history.
+
+The artifacts and their parent processes are retrieved in bulk once, and the
+graph is then walked in memory instead of querying the LIMS at each step.
+A ProcessIndex of the processes using each artifact can be built once for a
+whole project and shared by all the histories.
+"""
+
+import json
+from collections import OrderedDict
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LineageGraph(object):
+    """The artifacts of a sample linked to the processes producing them
+    and to the inputs of those processes.
+    lims: The Lims instance.
+    artifacts: The artifacts of the sample, e.g. all its analytes.
+    processes_per_artifact: Optional dictionary from artifact limsid to the
+                            list of processes using it as input, used instead
+                            of querying the LIMS.
+    """
+
+    def __init__(self, lims, artifacts, processes_per_artifact=None):
+        self.lims = lims
+        self.processes_per_artifact = processes_per_artifact
+        self.artifacts = OrderedDict((a.id, a) for a in lims.resolve(artifacts))
+        self._producer = dict()
+        self._inputs = dict()
+        self._consumers = dict()
+        self._build()
+
+    def _build(self):
+        "Resolve the parent processes in bulk and index the graph edges."
+        for id, artifact in self.artifacts.items():
+            process = artifact.parent_process
+            if process is not None:
+                self._producer[id] = process
+        processes = self.lims.resolve(list(self._producer.values()))
+        self._load_types(processes)
+        for id, process in self._producer.items():
+            self._inputs[id] = [i['limsid'] for i in process.io_index.inputs(id)]
+
+    def _load_types(self, processes):
+        "Resolve the process types of the processes, each one once."
+        self.lims.resolve([p.type for p in processes if p.type is not None])
+
+    def parent_process(self, artifact_id):
+        "Return the process producing the artifact, or None."
+        return self._producer.get(artifact_id)
+
+    def inputs(self, artifact_id):
+        """Return the limsids of the inputs of the process producing the
+        artifact that belong to the graph."""
+        return [id for id in self._inputs.get(artifact_id, ()) if id in self.artifacts]
+
+    def ancestors(self, artifact_id):
+        """Return the limsids of the artifacts the artifact derives from, from
+        the closest to the furthest. At each step the first input of the
+        producing process belonging to the graph is followed."""
+        result = []
+        seen = set([artifact_id])
+        while True:
+            inputs = self.inputs(artifact_id)
+            if not inputs or inputs[0] in seen:
+                return result
+            artifact_id = inputs[0]
+            seen.add(artifact_id)
+            result.append(artifact_id)
+
+    def consumers(self, artifact_ids):
+        """Return an OrderedDict from each of the artifact limsids to the list
+        of processes using it as input. The processes are queried with one
+        request for all artifacts unless processes_per_artifact was given,
+        and are then resolved in bulk."""
+        missing = [id for id in artifact_ids if id not in self._consumers]
+        if missing:
+            if self.processes_per_artifact:
+                for id in missing:
+                    self._consumers[id] = list(self.processes_per_artifact.get(id, ()))
+                self.lims.resolve([p for id in missing for p in self._consumers[id]])
+            else:
+                processes = self.lims.resolve(self.lims.get_processes(inputartifactlimsid=missing))
+                for id in missing:
+                    self._consumers[id] = []
+                for process in processes:
+                    for id in process.io_index.input_ids():
+                        if id in self._consumers and process not in self._consumers[id]:
+                            self._consumers[id].append(process)
+            self._load_types([p for id in missing for p in self._consumers[id]])
+        return OrderedDict((id, self._consumers[id]) for id in artifact_ids)
+
+    def history(self, out_art, in_art=None):
+        """Return (history, history_list) for the artifact with the limsid
+        out_art, as computed by SampleHistory.
+        history: Dictionary from input artifact limsid to a dictionary from
+                 process limsid to the step information of each process
+                 using the input.
+        history_list: The limsids of the inputs, from the closest to out_art.
+        in_art: Optional limsid of the input of the process producing out_art,
+                when out_art is not an artifact of the graph, e.g. a file.
+        """
+        history = dict()
+        chain = []
+        outputs = dict()
+        if in_art:
+            chain.append(in_art)
+            start = in_art
+        else:
+            start = out_art
+        for id in self.ancestors(start):
+            outputs[id] = chain[-1] if chain else start
+            chain.append(id)
+        consumers = self.consumers(chain)
+        for position, input_art in enumerate(chain):
+            if in_art and position == 0:
+                outart, producer = out_art, None
+            else:
+                outart = outputs[input_art]
+                producer = self.parent_process(outart)
+            history[input_art] = dict()
+            for process in consumers[input_art]:
+                if producer is None:
+                    process_outart = outart if outart in process.io_index.output_ids() else None
+                else:
+                    process_outart = outart if process == producer else None
+                history[input_art][process.id] = {'date': process.date_run,
+                                                  'id': process.id,
+                                                  'outart': process_outart,
+                                                  'inart': input_art,
+                                                  'type': process.type.id,
+                                                  'name': process.type.name}
+        return history, chain
+
+
+class ProcessIndex(object):
+    """Index from artifact limsid to the processes using the artifact as
+    input, built with few get_processes queries and shared by the
+    SampleHistory instances of a project as their processes_per_artifact.
+    Only the limsids are kept, so the index is small and can be saved to
+    a file and loaded again.
+    """
+
+    def __init__(self, lims, index=None):
+        self.lims = lims
+        self.index = index or dict()
+
+    @classmethod
+    def for_project(cls, lims, projectname):
+        "Build the index of all the processes of the project with the name."
+        result = cls(lims)
+        result.add_processes(lims.get_processes(projectname=projectname))
+        return result
+
+    @classmethod
+    def for_samples(cls, lims, samples):
+        "Build the index of the processes using the artifacts of the samples."
+        artifacts = lims.get_artifacts(samplelimsid=[s.id for s in samples])
+        return cls.for_artifacts(lims, [a.id for a in artifacts])
+
+    @classmethod
+    def for_artifacts(cls, lims, artifact_ids):
+        """Build the index of the processes using the artifacts with the
+        limsids; artifacts without processes are indexed with none."""
+        result = cls(lims)
+        artifact_ids = list(OrderedDict.fromkeys(artifact_ids))
+        processes = lims.get_processes(inputartifactlimsid=artifact_ids)
+        for id in artifact_ids:
+            result.index.setdefault(id, [])
+        result.add_processes(processes)
+        return result
+
+    def add_processes(self, processes):
+        "Load the processes in bulk and index them by their inputs."
+        for process in self.lims.resolve(processes):
+            for id in process.io_index.input_ids():
+                ids = self.index.setdefault(id, [])
+                if process.id not in ids:
+                    ids.append(process.id)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, artifact_id):
+        return artifact_id in self.index
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __getitem__(self, artifact_id):
+        from genologics.entities import Process
+        return [Process(self.lims, id=id) for id in self.index[artifact_id]]
+
+    def get(self, artifact_id, default=None):
+        try:
+            return self[artifact_id]
+        except KeyError:
+            return default
+
+    def save(self, filename):
+        "Write the index to the file as JSON."
+        with open(filename, 'w') as outfile:
+            json.dump({'baseuri': self.lims.baseuri, 'index': self.index}, outfile)
+
+    @classmethod
+    def load(cls, lims, filename):
+        "Read an index written by save() for the same LIMS."
+        with open(filename) as infile:
+            data = json.load(infile)
+        if data['baseuri'] != lims.baseuri:
+            raise ValueError("index %s was built for %s" % (filename, data['baseuri']))
+        return cls(lims, data['index'])
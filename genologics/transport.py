@@ -0,0 +1,235 @@
+"""Python interface to GenoLogics LIMS via its REST API.
+
+Policies applied by the LIMS interface to the HTTP requests it sends.
+"""
+
+import fnmatch
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+IDEMPOTENT_METHODS = frozenset(['get', 'head', 'put', 'delete', 'options'])
+RETRY_STATUSES = frozenset([502, 503, 504])
+_API_ROOT = re.compile(r'^.*?/api/[^/]+/')
+
+
+class RetryPolicy(object):
+    """Decides which failed requests are sent again, and after how long.
+
+    A request is retried when the server answers with one of the statuses
+    (by default 502, 503 and 504) or when it times out or the connection
+    fails. The delay before retry n (from 0) is drawn uniformly between 0 and
+    min(max_backoff, backoff * 2 ** n) seconds, or is the Retry-After delay
+    sent by the server if that is longer.
+
+    retries: The maximum number of retries of a request.
+    backoff: The base delay, in seconds.
+    max_backoff: The maximum delay, in seconds.
+    statuses: The HTTP status codes that are retried.
+    budget_ratio, budget_min: Retries are only made while their total
+         number is below budget_min plus budget_ratio times the number of
+         requests sent, so that a server that is down is not flooded with
+         retries by every caller.
+    """
+
+    def __init__(self, retries=4, backoff=0.5, max_backoff=30, statuses=RETRY_STATUSES,
+                 budget_ratio=0.2, budget_min=10):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.budget_ratio = budget_ratio
+        self.budget_min = budget_min
+        self.requests = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+
+    def request_sent(self):
+        "Called for each new request, before its first attempt."
+        with self._lock:
+            self.requests += 1
+
+    def retry(self, attempt, response=None, exception=None):
+        """Return True if the attempt (from 0) that got the response or raised
+        the exception is to be retried, and count the retry in the budget."""
+        if attempt >= self.retries:
+            return False
+        if exception is not None:
+            if not isinstance(exception, (requests.exceptions.Timeout,
+                                          requests.exceptions.ConnectionError)):
+                return False
+        elif response.status_code not in self.statuses:
+            return False
+        with self._lock:
+            if self.retried >= self.budget_min + self.budget_ratio * self.requests:
+                return False
+            self.retried += 1
+        return True
+
+    def delay(self, attempt, response=None):
+        "Return the number of seconds to wait before retrying the attempt."
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if response is not None:
+            try:
+                delay = max(delay, min(self.max_backoff, float(response.headers['retry-after'])))
+            except (KeyError, TypeError, ValueError):
+                pass
+        return delay
+
+    @property
+    def stats(self):
+        "Return the request and retry counters as a dictionary."
+        return dict(requests=self.requests, retries=self.retried)
+
+
+class Limit(object):
+    """Rate and concurrency limit on the requests to an endpoint family.
+
+    pattern: fnmatch pattern matched against the path of the request
+             relative to the API root, e.g. 'artifacts/batch/*' or
+             'processes*'; '*' matches all requests.
+    methods: The lower case HTTP verbs limited, e.g. ['post']; None for all.
+    rate: The sustained number of requests per second, enforced with a token
+          bucket; None for no rate limit.
+    burst: The number of requests that can be sent at once after a quiet
+           period; by default the rate, and at least 1.
+    max_in_flight: The maximum number of requests waiting for their
+                   response at the same time; None for no limit.
+
+    The time callers spent waiting on the limit is reported by stats.
+    """
+
+    def __init__(self, pattern='*', methods=None, rate=None, burst=None, max_in_flight=None):
+        self.pattern = pattern
+        self.methods = frozenset(m.lower() for m in methods) if methods else None
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate or 1)
+        self.max_in_flight = max_in_flight
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+        self._semaphore = threading.Semaphore(max_in_flight) if max_in_flight else None
+        self.requests = 0
+        self.waits = 0
+        self.wait_time = 0.0
+
+    def __repr__(self):
+        return "%s(%r, methods=%r)" % (self.__class__.__name__, self.pattern,
+                                       sorted(self.methods) if self.methods else None)
+
+    def matches(self, method, path):
+        return (self.methods is None or method in self.methods) and fnmatch.fnmatchcase(path, self.pattern)
+
+    def acquire(self):
+        "Wait until a request can be sent. Return the number of seconds waited."
+        start = time.time()
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return self.record(time.time() - start)
+
+    def reserve(self):
+        """Take a token of the rate limit, possibly going into debt. Return the
+        number of seconds to wait for it before sending the request."""
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Take the token now, possibly going into debt, and wait for it outside the lock
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def record(self, waited):
+        "Account for a request sent after waiting the number of seconds; return it."
+        with self._lock:
+            self.requests += 1
+            self.wait_time += waited
+            if waited > 0.001:
+                self.waits += 1
+        return waited
+
+    def release(self):
+        "Called when the response of a request has been received."
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    @property
+    def stats(self):
+        "Return the request count and the waits on this limit as a dictionary."
+        return dict(requests=self.requests, waits=self.waits, wait_time=self.wait_time)
+
+
+class RequestGovernor(object):
+    """Applies a list of Limit to the requests sent by a LIMS interface.
+
+    A request is subject to every limit matching it, acquired in list order,
+    e.g. [Limit('artifacts/batch/*', max_in_flight=2), Limit('*', rate=10)]
+    allows 2 concurrent batch requests within 10 requests per second overall.
+    """
+
+    def __init__(self, limits=()):
+        self.limits = list(limits)
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def matching(self, method, uri):
+        "Return the limits applying to a request, in list order."
+        if not self.limits:
+            return []
+        path = _API_ROOT.sub('', urlparse(uri).path, count=1)
+        return [limit for limit in self.limits if limit.matches(method, path)]
+
+    def acquire(self, method, uri):
+        """Wait for the limits of a request and return the list of limits held,
+        to give back to release() once the response has been read."""
+        acquired = []
+        try:
+            waited = 0
+            for limit in self.matching(method, uri):
+                waited += limit.acquire()
+                acquired.append(limit)
+        except BaseException:
+            self.release(acquired)
+            raise
+        self.add_wait(waited)
+        return acquired
+
+    def add_wait(self, waited):
+        "Account for the number of seconds a request waited on the limits."
+        if waited:
+            with self._lock:
+                self.wait_time += waited
+
+    def release(self, acquired):
+        "Release the limits returned by acquire(); None is ignored."
+        for limit in reversed(acquired or ()):
+            limit.release()
+
+    @contextmanager
+    def slot(self, method, uri):
+        "Context manager waiting for the limits of a request and holding them until done."
+        acquired = self.acquire(method, uri)
+        try:
+            yield
+        finally:
+            self.release(acquired)
+
+    @property
+    def stats(self):
+        """Return a dictionary with the total time spent waiting on the limits,
+        and the list of (limit, stats of the limit) pairs."""
+        return dict(wait_time=self.wait_time,
+                    limits=[(limit, limit.stats) for limit in self.limits])
@@ -49,6 +49,11 @@ setup(name='genologics',
       install_requires=[
           "requests"
       ],
+      extras_require={
+          "async": ["aiohttp"],
+          "lxml": ["lxml"],
+          "columnar": ["numpy", "pandas"],
+      },
       entry_points="""
       # -*- Entry points: -*-
       """,
@@ -0,0 +1,118 @@
+import asyncio
+from unittest import TestCase, skipIf
+
+try:
+    from unittest.mock import patch, AsyncMock
+    from genologics.aio import AsyncLims, AsyncResponse
+    from genologics.transport import Limit
+    from genologics.lims import TIMEOUT
+except (ImportError, SyntaxError):  # Python 2, Python < 3.8 or aiohttp missing
+    AsyncLims = None
+
+from genologics.entities import Artifact, Process, Sample
+
+url = 'http://testgenologics.com:4040'
+
+sample_page1_xml = """<smp:samples xmlns:smp="http://genologics.com/ri/sample">
+    <sample uri="{url}/api/v2/samples/s1" limsid="s1"/>
+    <sample uri="{url}/api/v2/samples/s2" limsid="s2"/>
+    <next-page uri="{url}/api/v2/samples?start-index=2"/>
+</smp:samples>""".format(url=url)
+sample_page2_xml = """<smp:samples xmlns:smp="http://genologics.com/ri/sample">
+    <sample uri="{url}/api/v2/samples/s3" limsid="s3"/>
+</smp:samples>""".format(url=url)
+artifacts_xml = '<art:details xmlns:art="http://genologics.com/ri/artifact">%s</art:details>' % ''.join(
+    '<art:artifact limsid="a{0}"><name>a{0}</name></art:artifact>'.format(i) for i in range(3))
+process_xml = '<prc:process xmlns:prc="http://genologics.com/ri/process"><type>QC</type></prc:process>'
+
+
+def run(coroutine):
+    return asyncio.new_event_loop().run_until_complete(coroutine)
+
+
+@skipIf(AsyncLims is None, 'requires Python 3.8 and aiohttp')
+class TestAsyncLims(TestCase):
+
+    def setUp(self):
+        self.lims = AsyncLims(url, username='test', password='password')
+
+    def test_async_pagination(self):
+        pages = [AsyncResponse(200, sample_page1_xml, url), AsyncResponse(200, sample_page2_xml, url)]
+        with patch.object(AsyncLims, '_request', new_callable=AsyncMock, side_effect=pages) as mocked_request:
+            samples = run(self.lims.iter_samples(projectname='p1').collect())
+            assert [s.id for s in samples] == ['s1', 's2', 's3']
+            assert mocked_request.call_count == 2
+            assert mocked_request.call_args_list[0][1]['params'] == {'projectname': 'p1'}
+
+    def test_sync_listing_still_works(self):
+        with patch.object(AsyncLims, '_request', new_callable=AsyncMock) as mocked_request:
+            with patch('requests.Session.get', side_effect=[AsyncResponse(200, sample_page1_xml, url),
+                                                            AsyncResponse(200, sample_page2_xml, url)]):
+                assert [s.id for s in self.lims.get_samples()] == ['s1', 's2', 's3']
+            assert mocked_request.call_count == 0
+
+    def test_aresolve(self):
+        artifacts = [Artifact(self.lims, id='a%s' % i) for i in range(3)]
+        processes = [Process(self.lims, id='p%s' % i) for i in range(2)]
+
+        def request(method, uri, **kwargs):
+            return AsyncResponse(200, artifacts_xml if method == 'POST' else process_xml, uri)
+
+        with patch.object(AsyncLims, '_request', new_callable=AsyncMock, side_effect=request) as mocked_request:
+            result = run(self.lims.aresolve(artifacts + processes + artifacts[:1]))
+            assert mocked_request.call_count == 3
+        assert result == artifacts + processes
+        assert [a.name for a in artifacts] == ['a0', 'a1', 'a2']
+
+    def test_entity_aget(self):
+        process = Process(self.lims, id='p1')
+        with patch.object(AsyncLims, '_request', new_callable=AsyncMock,
+                          return_value=AsyncResponse(200, process_xml, url)) as mocked_request:
+            assert run(process.aget()) is process
+            run(process.aget())
+            assert mocked_request.call_count == 1
+        assert process.root.find('type').text == 'QC'
+
+    def test_async_split_query(self):
+        lims = AsyncLims(url, username='test', password='password', max_url_length=120)
+        ids = ['s%s' % i for i in range(20)]
+
+        def request(method, uri, params=None, **kwargs):
+            xml = '<smp:samples xmlns:smp="http://genologics.com/ri/sample">%s</smp:samples>' % ''.join(
+                '<sample uri="{0}/api/v2/samples/{1}" limsid="{1}"/>'.format(url, id)
+                for id in ['s0'] + params['samplelimsid'])
+            return AsyncResponse(200, xml, uri)
+
+        with patch.object(AsyncLims, '_request', new_callable=AsyncMock, side_effect=request) as mocked_request:
+            listing = lims._iter_instances(Sample, params={'samplelimsid': ids})
+            samples = run(listing.collect())
+            assert mocked_request.call_count > 1
+        assert sorted(s.id for s in samples) == sorted(ids)
+
+    def test_limits(self):
+        lims = AsyncLims(url, username='test', password='password',
+                         limits=[Limit('processes/*', max_in_flight=1)])
+        in_flight = []
+
+        async def send(method, uri, query, data, headers):
+            in_flight.append(uri)
+            assert len(in_flight) == 1
+            await asyncio.sleep(0.01)
+            in_flight.remove(uri)
+            return AsyncResponse(200, process_xml, uri)
+
+        with patch.object(AsyncLims, '_send', side_effect=send):
+            run(lims.aresolve([Process(lims, id='p%s' % i) for i in range(4)]))
+        assert lims.governor.limits[0].stats['requests'] == 4
+        assert lims.governor.stats['wait_time'] > 0
+
+    def test_timeout_per_socket_operation(self):
+        async def timeout():
+            try:
+                return self.lims._get_session().timeout
+            finally:
+                await self.lims.close()
+
+        timeout = run(timeout())
+        assert timeout.total is None
+        assert timeout.sock_connect == timeout.sock_read == TIMEOUT
@@ -0,0 +1,219 @@
+import gc
+import os
+import shutil
+import tempfile
+from sys import version_info
+from unittest import TestCase
+
+from genologics.cache import EntityCache, WeakEntityCache, DiskCache
+from genologics.entities import Artifact, Processtype
+from genologics.lims import Lims
+
+if version_info[0] == 2:
+    from mock import patch, Mock
+else:
+    from unittest.mock import patch, Mock
+
+url = 'http://testgenologics.com:4040'
+
+artifact_xml = """<?xml version='1.0' encoding='utf-8'?>
+<art:artifact xmlns:art="http://genologics.com/ri/artifact" uri="{url}/api/v2/artifacts/a1" limsid="a1">
+<name>test_sample1</name>
+<type>Analyte</type>
+</art:artifact>""".format(url=url)
+
+
+class TestEntityCache(TestCase):
+
+    def test_eviction_order(self):
+        cache = EntityCache(capacity=2)
+        cache['a'] = 1
+        cache['b'] = 2
+        assert cache['a'] == 1  # refreshes 'a'
+        cache['c'] = 3
+        assert 'b' not in cache
+        assert 'a' in cache and 'c' in cache
+        assert cache.evictions == 1
+
+    def test_counters(self):
+        cache = EntityCache(capacity=10)
+        cache['a'] = 1
+        cache['a']
+        self.assertRaises(KeyError, cache.__getitem__, 'b')
+        assert cache.get('c') is None
+        assert cache.stats == dict(size=1, capacity=10, hits=1, misses=2, evictions=0)
+
+    def test_pop(self):
+        cache = EntityCache()
+        cache['a'] = 1
+        assert cache.pop('a') == 1
+        assert cache.pop('a') is None
+        assert len(cache) == 0
+
+    def test_mapping(self):
+        cache = EntityCache()
+        cache['a'] = 1
+        cache['b'] = 2
+        assert list(cache) == ['a', 'b']
+        assert cache.values() == [1, 2]
+        assert dict(cache.items()) == dict(a=1, b=2)
+        for key in cache:
+            cache[key + key] = 0
+        assert len(cache) == 4
+        assert cache.stats['hits'] == 0
+
+
+class TestLimsCache(TestCase):
+
+    def test_entity_identity(self):
+        lims = Lims(url, username='test', password='password', cache_size=2)
+        a1 = Artifact(lims, id='a1')
+        assert Artifact(lims, id='a1') is a1
+        Artifact(lims, id='a2')
+        Artifact(lims, id='a3')
+        assert len(lims.cache) == 2
+        assert lims.cache.evictions == 1
+        assert Artifact(lims, id='a1') is not a1
+
+
+class TestWeakEntityCache(TestCase):
+
+    def setUp(self):
+        self.lims = Lims(url, username='test', password='password',
+                         cache=WeakEntityCache(max_elements=5))
+
+    def test_identity_kept_while_referenced(self):
+        a1 = Artifact(self.lims, id='a1')
+        for i in range(100):
+            Artifact(self.lims, id='other%s' % i)
+        assert Artifact(self.lims, id='a1') is a1
+        del a1
+        gc.collect()
+        assert 'http://testgenologics.com:4040/api/v2/artifacts/a1' not in self.lims.cache
+
+    def test_mapping(self):
+        a1 = Artifact(self.lims, id='a1')
+        assert list(self.lims.cache) == [a1.uri]
+        assert self.lims.cache.items() == [(a1.uri, a1)]
+        assert self.lims.cache.values() == [a1]
+
+    def test_roots_evicted_and_refetched(self):
+        a1 = Artifact(self.lims, id='a1')
+        a2 = Artifact(self.lims, id='a2')
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200)) as mocked_get:
+            assert a1.name == 'test_sample1'
+            assert self.lims.cache.n_elements == 3
+            assert a2.name == 'test_sample1'
+            # Both roots exceed the budget of 5 elements, a1 is dropped
+            assert a1.root is None
+            assert a2.root is not None
+            assert self.lims.cache.n_elements == 3
+            assert self.lims.cache.evictions == 1
+            assert a1.type == 'Analyte'
+            assert mocked_get.call_count == 3
+        assert Artifact(self.lims, id='a1') is a1
+
+    def test_modified_roots_are_kept(self):
+        a1 = Artifact(self.lims, id='a1')
+        a2 = Artifact(self.lims, id='a2')
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200)):
+            a1.name = 'renamed'
+            assert a2.name == 'test_sample1'
+        assert a1.root is not None
+        assert a2.root is not None
+        assert self.lims.cache.evictions == 0
+        with patch('requests.Session.put', return_value=Mock(content=artifact_xml, status_code=200)):
+            a1.put()
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200)):
+            Artifact(self.lims, id='a3').get()
+        assert a1.root is None
+        self.assertRaises(ValueError, a1.put)
+
+
+class TestCacheExpiry(TestCase):
+
+    def setUp(self):
+        self.lims = Lims(url, username='test', password='password',
+                         cache=EntityCache(ttl={Artifact: 60}))
+
+    def test_fresh_root_is_reused(self):
+        a1 = Artifact(self.lims, id='a1')
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200,
+                                                             headers={})) as mocked_get:
+            assert a1.name == 'test_sample1'
+            assert a1.type == 'Analyte'
+            assert mocked_get.call_count == 1
+
+    def test_expired_root_is_revalidated(self):
+        a1 = Artifact(self.lims, id='a1')
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200,
+                                                             headers={'etag': '"v1"'})):
+            assert a1.name == 'test_sample1'
+        root = a1.root
+        a1._loaded_at -= 120
+        with patch('requests.Session.get', return_value=Mock(content='', status_code=304)) as mocked_get:
+            assert a1.name == 'test_sample1'
+            assert mocked_get.call_args[1]['headers']['if-none-match'] == '"v1"'
+        assert a1.root is root
+        assert not self.lims.cache.expired(a1)
+
+    def test_expired_root_without_validators_is_refetched(self):
+        a1 = Artifact(self.lims, id='a1')
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200,
+                                                             headers={})):
+            a1.get()
+        root = a1.root
+        a1._loaded_at -= 120
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200,
+                                                             headers={})) as mocked_get:
+            a1.get()
+            assert 'if-none-match' not in mocked_get.call_args[1]['headers']
+        assert a1.root is not root
+
+
+    def test_expired_root_with_changes_is_kept(self):
+        a1 = Artifact(self.lims, id='a1')
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200,
+                                                             headers={})):
+            a1.name = 'renamed'
+        a1._loaded_at -= 120
+        with patch('requests.Session.get') as mocked_get:
+            assert a1.name == 'renamed'
+            assert mocked_get.call_count == 0
+
+class TestDiskCache(TestCase):
+    processtype_xml = """<?xml version='1.0' encoding='utf-8'?>
+<ptp:process-type xmlns:ptp="http://genologics.com/ri/processtype" uri="{url}/api/v2/processtypes/1" name="QC"/>
+""".format(url=url)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _lims(self):
+        return Lims(url, username='test', password='password',
+                    persistent_cache=DiskCache(self.directory, ttl={Processtype: 3600}))
+
+    def test_shared_between_lims_instances(self):
+        with patch('requests.Session.get', return_value=Mock(content=self.processtype_xml,
+                                                             status_code=200)) as mocked_get:
+            assert Processtype(self._lims(), id='1').name == 'QC'
+            assert Processtype(self._lims(), id='1').name == 'QC'
+            assert mocked_get.call_count == 1
+
+    def test_expired_entries_are_refetched(self):
+        with patch('requests.Session.get', return_value=Mock(content=self.processtype_xml,
+                                                             status_code=200)) as mocked_get:
+            lims = self._lims()
+            Processtype(lims, id='1').get()
+            path = lims.persistent_cache.path(lims.get_uri('processtypes', '1'))
+            os.utime(path, (0, 0))
+            assert Processtype(self._lims(), id='1').name == 'QC'
+            assert mocked_get.call_count == 2
+
+    def test_uncached_classes_are_not_stored(self):
+        with patch('requests.Session.get', return_value=Mock(content=artifact_xml, status_code=200)):
+            Artifact(self._lims(), id='a1').get()
+        assert os.listdir(self.directory) == []
@@ -0,0 +1,76 @@
+import datetime
+from sys import version_info
+from unittest import TestCase, skipIf
+
+from genologics.entities import Artifact
+from genologics.lims import Lims
+
+try:
+    import numpy
+    import pandas
+except ImportError:
+    numpy = pandas = None
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+if version_info[0] == 2:
+    from mock import patch, Mock
+else:
+    from unittest.mock import patch, Mock
+
+url = 'http://testgenologics.com:4040'
+
+details_xml = """<art:details xmlns:art="http://genologics.com/ri/artifact" xmlns:udf="http://genologics.com/ri/userdefined">
+<art:artifact limsid="a1" uri="{url}/api/v2/artifacts/a1">
+<udf:field type="Numeric" name="Conc">1.5</udf:field>
+<udf:field type="Boolean" name="Pass">true</udf:field>
+<udf:field type="Date" name="Run">2020-01-02</udf:field>
+<udf:field type="String" name="Note">ok</udf:field>
+</art:artifact>
+<art:artifact limsid="a2" uri="{url}/api/v2/artifacts/a2">
+<udf:field type="Numeric" name="Conc">3</udf:field>
+</art:artifact>
+</art:details>""".format(url=url)
+
+
+@skipIf(pandas is None, 'requires numpy and pandas')
+class TestUdfFrame(TestCase):
+
+    def setUp(self):
+        self.lims = Lims(url, username='test', password='password')
+        self.artifacts = [Artifact(self.lims, id='a1'), Artifact(self.lims, id='a2')]
+
+    def test_pandas(self):
+        with patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)) as mocked_post:
+            frame = self.lims.udf_frame(self.artifacts)
+            assert mocked_post.call_count == 1
+        assert list(frame.index) == ['a1', 'a2']
+        assert list(frame.columns) == ['Conc', 'Pass', 'Run', 'Note']
+        assert frame['Conc'].dtype == numpy.float64
+        assert list(frame['Conc']) == [1.5, 3.0]
+        assert frame['Pass'][0] == True and frame['Pass'].isna()[1]
+        assert frame['Run'][0] == pandas.Timestamp(datetime.date(2020, 1, 2))
+        assert pandas.isna(frame['Run'][1])
+        assert frame['Note'][0] == 'ok' and frame['Note'][1] is None
+
+    def test_numpy_fields(self):
+        with patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)):
+            ids, columns = self.lims.udf_frame(self.artifacts, fields=['Conc', 'Missing'], format='numpy')
+        assert ids == ['a1', 'a2']
+        assert list(columns) == ['Conc', 'Missing']
+        assert list(columns['Conc']) == [1.5, 3.0]
+        assert list(columns['Missing']) == [None, None]
+
+    @skipIf(pyarrow is None, 'requires pyarrow')
+    def test_arrow(self):
+        with patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)):
+            table = self.lims.udf_frame(self.artifacts, format='arrow')
+        assert table.column_names == ['id', 'Conc', 'Pass', 'Run', 'Note']
+        assert table.column('Pass').to_pylist() == [True, None]
+        assert table.column('Run').to_pylist() == [datetime.date(2020, 1, 2), None]
+        assert table.column('Note').to_pylist() == ['ok', None]
+
+    def test_format(self):
+        self.assertRaises(ValueError, self.lims.udf_frame, [], format='csv')
@@ -1,9 +1,9 @@
 from io import BytesIO
 from sys import version_info
 from unittest import TestCase
-from xml.etree import ElementTree
+from genologics.etree import ElementTree, fromstring
 
-from genologics.descriptors import StringDescriptor, StringAttributeDescriptor, StringListDescriptor, \
+from genologics.descriptors import invalidate, StringDescriptor, StringAttributeDescriptor, StringListDescriptor, \
     StringDictionaryDescriptor, IntegerDescriptor, BooleanDescriptor, UdfDictionary, EntityDescriptor
 from genologics.entities import Artifact
 from genologics.lims import Lims
@@ -26,7 +26,7 @@ class TestDescriptor(TestCase):
 
 class TestStringDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="utf-8"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="utf-8"?>
 <test-entry>
 <name>test name</name>
 </test-entry>
@@ -48,10 +48,27 @@ class TestStringDescriptor(TestDescriptor):
         sd.__set__(instance_new, "test name")
         assert instance_new.root.find('name').text == 'test name'
 
+    def test_index_follows_root(self):
+        sd = self._make_desc(StringDescriptor, 'name')
+        assert sd.__get__(self.instance, None) == "test name"
+        self.et.remove(self.et.find('name'))
+        node = ElementTree.SubElement(self.et, 'name')
+        node.text = "replaced"
+        invalidate(self.instance)
+        assert sd.__get__(self.instance, None) == "replaced"
+        self.instance.root = fromstring("<test-entry><name>other</name></test-entry>")
+        assert sd.__get__(self.instance, None) == "other"
+
+    def test_set_invalidates_index(self):
+        sd = self._make_desc(StringDescriptor, 'other')
+        assert sd.__get__(self.instance, None) is None
+        sd.__set__(self.instance, "new")
+        assert sd.__get__(self.instance, None) == "new"
+
 
 class TestIntegerDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry>
 <count>32</count>
 </test-entry>
@@ -78,7 +95,7 @@ class TestIntegerDescriptor(TestDescriptor):
 
 class TestBooleanDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry>
 <istest>true</istest>
 </test-entry>
@@ -105,7 +122,7 @@ class TestBooleanDescriptor(TestDescriptor):
 
 class TestEntityDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry>
 <artifact uri="http://testgenologics.com:4040/api/v2/artifacts/a1"></artifact>
 </test-entry>
@@ -133,7 +150,7 @@ class TestEntityDescriptor(TestDescriptor):
 
 class TestStringAttributeDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry name="test name">
 </test-entry>""")
         self.instance = Mock(root=self.et)
@@ -156,7 +173,7 @@ class TestStringAttributeDescriptor(TestDescriptor):
 
 class TestStringListDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry>
 <test-subentry>A01</test-subentry>
 <test-subentry>B01</test-subentry>
@@ -170,7 +187,7 @@ class TestStringListDescriptor(TestDescriptor):
 
 class TestStringDictionaryDescriptor(TestDescriptor):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry>
 <test-subentry>
 <test-firstkey/>
@@ -189,7 +206,7 @@ class TestStringDictionaryDescriptor(TestDescriptor):
 
 class TestUdfDictionary(TestCase):
     def setUp(self):
-        self.et = ElementTree.fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+        self.et = fromstring("""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <test-entry xmlns:udf="http://genologics.com/ri/userdefined">
 <udf:field type="String" name="test">stuff</udf:field>
 <udf:field type="Numeric" name="how much">42</udf:field>
@@ -264,7 +281,28 @@ class TestUdfDictionary(TestCase):
         assert self._get_udf_value(self.dict1, 'test') == 'unicode2'
 
     def test___delitem__(self):
-        pass
+        del self.dict1['how much']
+        assert 'how much' not in self.dict1
+        assert [e.attrib['name'] for e in self.et] == ['test', 'really?']
+        self.dict1['how much'] = 12
+        assert self._get_udf_value(self.dict1, 'how much') == '12'
+
+    def test___delitem__udt(self):
+        et = fromstring("""<test-entry xmlns:udf="http://genologics.com/ri/userdefined">
+<udf:type name="udt1"><udf:field type="String" name="a">x</udf:field></udf:type>
+</test-entry>""")
+        udt = UdfDictionary(Mock(root=et), udt=True)
+        del udt['a']
+        assert len(et.find('{http://genologics.com/ri/userdefined}type')) == 0
+
+    def test_update(self):
+        self.dict1.update({'test': 'updated', 'new numeric': 1.5}, really=False)
+        assert self.dict1['test'] == 'updated'
+        assert self.dict1['new numeric'] == 1.5
+        assert self._get_udf_value(self.dict1, 'new numeric') == '1.5'
+        assert self._get_udf_value(self.dict1, 'really?') == 'true'
+        assert self.dict1['really'] is False
+        assert len(self.et) == 5
 
     def test_items(self):
         pass
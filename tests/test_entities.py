@@ -1,11 +1,12 @@
 import operator
 from sys import version_info
 from unittest import TestCase
-from xml.etree import ElementTree
+from genologics.etree import ElementTree, fromstring
 
 from genologics.entities import StepActions, Researcher, Artifact, \
-    Step, StepPlacements, Container, Stage, ReagentKit, ReagentLot, Sample, Project
+    Step, StepPlacements, Container, Stage, ReagentKit, ReagentLot, Sample, Project, Process
 from genologics.lims import Lims
+from genologics.descriptors import invalidate
 
 if version_info[0] == 2:
     from mock import patch, Mock
@@ -36,6 +37,31 @@ generic_artifact_xml = """<?xml version='1.0' encoding='utf-8'?>
 </workflow-stages>
 </art:artifact>"""
 
+generic_process_xml = """<?xml version='1.0' encoding='utf-8'?>
+<prc:process xmlns:prc="http://genologics.com/ri/process" uri="{url}/api/v2/processes/p1" limsid="p1">
+<type>Test process</type>
+<input-output-map>
+<input uri="{url}/api/v2/artifacts/i1" limsid="i1"/>
+<output uri="{url}/api/v2/artifacts/o1" output-generation-type="PerInput" output-type="Analyte" limsid="o1"/>
+</input-output-map>
+<input-output-map>
+<input uri="{url}/api/v2/artifacts/i1" limsid="i1"/>
+<output uri="{url}/api/v2/artifacts/r1" output-generation-type="PerInput" output-type="ResultFile" limsid="r1"/>
+</input-output-map>
+<input-output-map>
+<input uri="{url}/api/v2/artifacts/i2" limsid="i2"/>
+<output uri="{url}/api/v2/artifacts/r2" output-generation-type="PerInput" output-type="ResultFile" limsid="r2"/>
+</input-output-map>
+<input-output-map>
+<input uri="{url}/api/v2/artifacts/i1" limsid="i1"/>
+<output uri="{url}/api/v2/artifacts/s1" output-generation-type="PerAllInputs" output-type="SharedResultFile" limsid="s1"/>
+</input-output-map>
+<input-output-map>
+<input uri="{url}/api/v2/artifacts/i2" limsid="i2"/>
+<output uri="{url}/api/v2/artifacts/s1" output-generation-type="PerAllInputs" output-type="SharedResultFile" limsid="s1"/>
+</input-output-map>
+</prc:process>"""
+
 generic_step_placements_xml = """<?xml version='1.0' encoding='utf-8'?>
 <stp:placements xmlns:stp="http://genologics.com/ri/step" uri="{url}/steps/s1/placements">
   <step uri="{url}/steps/s1" />
@@ -177,6 +203,34 @@ class TestEntities(TestCase):
         return self.lims.tostring(ElementTree.ElementTree(entity.root)).decode("utf-8")
 
 
+class TestEntityLayout(TestEntities):
+
+    def test_slots(self):
+        a = Artifact(self.lims, id='a1')
+        assert not hasattr(a, '__dict__')
+        self.assertRaises(AttributeError, setattr, a, 'other', 1)
+        assert not hasattr(StepPlacements(self.lims, uri=url + '/api/v2/steps/s1/placements'), '__dict__')
+
+    def test_id_and_uri(self):
+        a = Artifact(self.lims, uri=self.lims.get_uri('artifacts', 'a1') + '?state=1')
+        assert a.id == 'a1'
+        assert a.uri == url + '/api/v2/artifacts/a1?state=1'
+        s = Sample._create(self.lims)
+        assert s.id is None
+        s._set_uri(url + '/api/v2/samples/s1')
+        assert s.id == 's1'
+
+    def test_equality(self):
+        a = Artifact(self.lims, id='a1')
+        assert a == Artifact(self.lims, uri=a.uri)
+        assert a != Artifact(self.lims, id='a2')
+        assert hash(a) == hash(a.uri)
+        assert len(set([a, Artifact(self.lims, id='a1'), Artifact(self.lims, id='a2')])) == 2
+        new1, new2 = Sample._create(self.lims), Sample._create(self.lims)
+        assert new1 != new2 and new1 == new1
+        assert a != 'a1'
+
+
 class TestStepActions(TestEntities):
     step_actions_xml = generic_step_actions_xml.format(url=url)
     step_actions_no_escalation_xml = generic_step_actions_no_escalation_xml.format(url=url)
@@ -184,7 +238,7 @@ class TestStepActions(TestEntities):
     def test_escalation(self):
         s = StepActions(uri=self.lims.get_uri('steps', 'step_id', 'actions'), lims=self.lims)
         with patch('requests.Session.get', return_value=Mock(content=self.step_actions_xml, status_code=200)):
-            with patch('requests.post', return_value=Mock(content=self.dummy_xml, status_code=200)):
+            with patch('requests.Session.post', return_value=Mock(content=self.dummy_xml, status_code=200)):
                 r = Researcher(uri='http://testgenologics.com:4040/researchers/r1', lims=self.lims)
                 a = Artifact(uri='http://testgenologics.com:4040/artifacts/r1', lims=self.lims)
                 expected_escalation = {
@@ -234,7 +288,7 @@ class TestStepPlacements(TestEntities):
                    return_value=Mock(content=self.original_step_placements_xml, status_code=200)):
             new_placements = [[a1, (c1, '3:1')], [a2, (c1, '4:1')]]
             s.set_placement_list(new_placements)
-            assert elements_equal(s.root, ElementTree.fromstring(self.modloc_step_placements_xml))
+            assert elements_equal(s.root, fromstring(self.modloc_step_placements_xml))
 
     def test_set_placements_list_fail(self):
         a1 = Artifact(uri='http://testgenologics.com:4040/artifacts/a1', lims=self.lims)
@@ -246,7 +300,7 @@ class TestStepPlacements(TestEntities):
                    return_value=Mock(content=self.original_step_placements_xml, status_code=200)):
             new_placements = [[a1, (c2, '1:1')], [a2, (c2, '1:1')]]
             s.set_placement_list(new_placements)
-            assert elements_equal(s.root, ElementTree.fromstring(self.modcont_step_placements_xml))
+            assert elements_equal(s.root, fromstring(self.modcont_step_placements_xml))
 
 
 class TestArtifacts(TestEntities):
@@ -266,6 +320,77 @@ class TestArtifacts(TestEntities):
         with patch('requests.Session.get', return_value=Mock(content=self.root_artifact_xml, status_code=200)):
             assert a.workflow_stages_and_statuses == expected_wf_stage
 
+    def test_udf_view_per_root(self):
+        a = Artifact(uri=self.lims.get_uri('artifacts', 'a1'), lims=self.lims)
+        with patch('requests.Session.get', return_value=Mock(content=self.root_artifact_xml, status_code=200)):
+            assert a.udf is a.udf
+            a.udf['Ave. Conc. (ng/uL)'] = 2
+            assert a.udf['Ave. Conc. (ng/uL)'] == 2
+            assert sorted(a.udf) == sorted(a.udf) == ['Ave. Conc. (ng/uL)', 'Workflow Desired']
+            udf = a.udf
+            a.get(force=True)
+            assert a.udf is not udf
+            assert a.udf['Ave. Conc. (ng/uL)'] == 1
+
+
+class TestProcess(TestEntities):
+    process_xml = generic_process_xml.format(url=url)
+
+    def setUp(self):
+        super(TestProcess, self).setUp()
+        self.process = Process(uri=self.lims.get_uri('processes', 'p1'), lims=self.lims)
+
+    def _artifact(self, id):
+        return Artifact(self.lims, id=id)
+
+    def test_outputs_per_input(self):
+        with patch('requests.Session.get', return_value=Mock(content=self.process_xml, status_code=200)):
+            p = self.process
+            assert p.outputs_per_input('i1') == [self._artifact(id) for id in ('o1', 'r1', 's1')]
+            assert p.outputs_per_input('i1', ResultFile=True) == [self._artifact('r1')]
+            assert p.outputs_per_input('i2', SharedResultFile=True) == [self._artifact('s1')]
+            assert p.outputs_per_input('i2', Analyte=True) == []
+            assert p.outputs_per_input('i3') == []
+
+    def test_all_inputs_and_outputs(self):
+        with patch('requests.Session.get', return_value=Mock(content=self.process_xml, status_code=200)):
+            p = self.process
+            assert p.all_inputs() == [self._artifact('i1'), self._artifact('i2')]
+            assert len(p.all_inputs(unique=False)) == 5
+            assert p.all_outputs() == [self._artifact(id) for id in ('o1', 'r1', 'r2', 's1')]
+            assert len(p.all_outputs(unique=False)) == 5
+            assert p.result_files() == [self._artifact('r1'), self._artifact('r2')]
+            assert p.shared_result_files() == [self._artifact('s1')]
+            assert p.analytes() == ([self._artifact('o1')], 'Output')
+
+    def test_io_index(self):
+        with patch('requests.Session.get', return_value=Mock(content=self.process_xml, status_code=200)):
+            p = self.process
+            assert p.io_index is p.io_index
+            assert [i['limsid'] for i in p.io_index.inputs('s1')] == ['i1', 'i2']
+            assert [o['limsid'] for o in p.io_index.outputs('i1', generation_type='PerInput')] == ['o1', 'r1']
+            assert len(p.input_output_maps) == 5
+            p.input_output_maps.pop()
+            assert len(p.input_output_maps) == 5
+            index = p.io_index
+            p.udf['Count'] = 3
+            assert p.io_index is index
+            maps = p.root.findall('input-output-map')
+            p.root.remove(maps[0])
+            p.root.append(maps[0])
+            invalidate(p)
+            assert p.io_index is not index
+            index = p.io_index
+            p.get(force=True)
+            assert p.io_index is not index
+
+    def test_input_artifact_list(self):
+        a = self._artifact('s1')
+        a.root = fromstring(generic_artifact_xml.format(url=url))
+        a.root.append(fromstring('<parent-process uri="{url}/api/v2/processes/p1" limsid="p1"/>'.format(url=url)))
+        with patch('requests.Session.get', return_value=Mock(content=self.process_xml, status_code=200)):
+            assert a.input_artifact_list() == [self._artifact('i1'), self._artifact('i2')]
+
 
 class TestReagentKits(TestEntities):
     url = 'http://testgenologics.com:4040'
@@ -280,7 +405,7 @@ class TestReagentKits(TestEntities):
             assert r.archived == False
 
     def test_create_entity(self):
-        with patch('genologics.lims.requests.post', return_value=Mock(content=self.reagentkit_xml, status_code=201)):
+        with patch('requests.Session.post', return_value=Mock(content=self.reagentkit_xml, status_code=201)):
             r = ReagentKit.create(self.lims, name='regaentkitname', supplier='reagentProvider',
                                   website='www.reagentprovider.com', archived=False)
         self.assertRaises(TypeError, ReagentKit.create, self.lims, error='test')
@@ -301,7 +426,7 @@ class TestReagentLots(TestEntities):
     def test_create_entity(self):
         with patch('requests.Session.get', return_value=Mock(content=self.reagentkit_xml, status_code=200)):
             r = ReagentKit(uri=self.lims.get_uri('reagentkits', 'r1'), lims=self.lims)
-        with patch('genologics.lims.requests.post',
+        with patch('requests.Session.post',
                    return_value=Mock(content=self.reagentlot_xml, status_code=201)) as patch_post:
             l = ReagentLot.create(
                     self.lims,
@@ -320,7 +445,7 @@ class TestSample(TestEntities):
     sample_creation = generic_sample_creation_xml.format(url=url)
 
     def test_create_entity(self):
-        with patch('genologics.lims.requests.post',
+        with patch('requests.Session.post',
                    return_value=Mock(content=self.sample_creation, status_code=201)) as patch_post:
             l = Sample.create(
                 self.lims,
@@ -338,6 +463,6 @@ class TestSample(TestEntities):
               <value>1:1</value>
             </location>
             </smp:samplecreation>'''
-            assert elements_equal(ElementTree.fromstring(patch_post.call_args_list[0][1]['data']), ElementTree.fromstring(data))
+            assert elements_equal(fromstring(patch_post.call_args_list[0][1]['data']), fromstring(data))
 
 
@@ -1,9 +1,12 @@
-import xml
+from io import BytesIO
 from unittest import TestCase
 
+import requests
 from requests.exceptions import HTTPError
 
-from genologics.lims import Lims
+from genologics.etree import fromstring
+from genologics.lims import Lims, Artifact, Process, BatchUpdateError
+from genologics.transport import RetryPolicy
 try:
     callable(1)
 except NameError: # callable() doesn't exist in Python 3.0 and 3.1
@@ -19,6 +22,11 @@ else:
     from unittest.mock import patch, Mock
     import builtins
 
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
 class TestLims(TestCase):
     url = 'http://testgenologics.com:4040'
     username = 'test'
@@ -27,6 +35,18 @@ class TestLims(TestCase):
 <smp:samples xmlns:smp="http://genologics.com/ri/sample">
     <sample uri="{url}/api/v2/samples/test_sample" limsid="test_id"/>
 </smp:samples>
+""".format(url=url)
+    sample_page1_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<smp:samples xmlns:smp="http://genologics.com/ri/sample">
+    <sample uri="{url}/api/v2/samples/s1" limsid="s1"/>
+    <sample uri="{url}/api/v2/samples/s2" limsid="s2"/>
+    <next-page uri="{url}/api/v2/samples?start-index=2"/>
+</smp:samples>
+""".format(url=url)
+    sample_page2_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<smp:samples xmlns:smp="http://genologics.com/ri/sample">
+    <sample uri="{url}/api/v2/samples/s3" limsid="s3"/>
+</smp:samples>
 """.format(url=url)
     error_xml = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
 <exc:exception xmlns:exc="http://genologics.com/ri/exception">
@@ -66,15 +86,138 @@ class TestLims(TestCase):
         assert hasattr(r.attrib, '__getitem__')
         assert mocked_instance.call_count == 1
         mocked_instance.assert_called_with('http://testgenologics.com:4040/api/v2/artifacts?sample_name=test_sample', timeout=16,
-                                  headers={'accept': 'application/xml'}, params={}, auth=('test', 'password'))
+                                  headers={'accept': 'application/xml'}, params={}, auth=('test', 'password'),
+                                  stream=True)
+
+    def test_get_streamed(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = BytesIO(self.sample_page1_xml.encode('utf-8'))
+        with patch('requests.Session.get', return_value=response), \
+                patch('genologics.lims.STREAM_CHUNK_SIZE', 16):
+            root = lims.get(lims.get_uri('samples'))
+        assert [node.attrib['limsid'] for node in root.findall('sample')] == ['s1', 's2']
+        assert response._content_consumed
+
+    def test_iter_samples(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        with patch('requests.Session.get', side_effect=[Mock(content=self.sample_page1_xml, status_code=200),
+                                                        Mock(content=self.sample_page2_xml, status_code=200)]) as mocked_get:
+            samples = lims.iter_samples(projectname='p1')
+            assert next(samples).id == 's1'
+            assert mocked_get.call_count == 1
+            assert [s.id for s in samples] == ['s2', 's3']
+            assert mocked_get.call_count == 2
+
+    def test_get_samples_all_pages(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        with patch('requests.Session.get', side_effect=[Mock(content=self.sample_page1_xml, status_code=200),
+                                                        Mock(content=self.sample_page2_xml, status_code=200)]):
+            assert [s.id for s in lims.get_samples()] == ['s1', 's2', 's3']
+        with patch('requests.Session.get', side_effect=[Mock(content=self.sample_page1_xml, status_code=200),
+                                                        Mock(content=self.sample_page2_xml, status_code=200)]):
+            assert lims.get_sample_number() == 3
+
+    def test_iter_samples_prefetch(self):
+        lims = Lims(self.url, username=self.username, password=self.password, prefetch_pages=2)
+        with patch('requests.Session.get', side_effect=[Mock(content=self.sample_page1_xml, status_code=200),
+                                                        Mock(content=self.sample_page2_xml, status_code=200)]) as mocked_get:
+            assert [s.id for s in lims.iter_samples()] == ['s1', 's2', 's3']
+            assert mocked_get.call_count == 2
+        with patch('requests.Session.get', side_effect=[Mock(content=self.sample_page1_xml, status_code=200),
+                                                        Mock(content=self.error_xml, status_code=400)]):
+            samples = lims.iter_samples()
+            assert next(samples).id == 's1'
+            self.assertRaises(HTTPError, list, samples)
+
+    def test_get_instances_add_info(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        lab_xml = """<lab:labs xmlns:lab="http://genologics.com/ri/lab">
+    <lab uri="{url}/api/v2/labs/1"><name>lab1</name></lab>
+</lab:labs>""".format(url=self.url)
+        with patch('requests.Session.get', return_value=Mock(content=lab_xml, status_code=200)):
+            labs, info = lims.get_labs(add_info=True)
+        assert [l.id for l in labs] == ['1']
+        assert info[0]['name'] == 'lab1'
+
+    def test_get_processes_split(self):
+        lims = Lims(self.url, username=self.username, password=self.password, max_url_length=200)
+        ids = ['2-%s' % i for i in range(40)]
+
+        def processes_xml(uri, params, **kwargs):
+            # each query returns p0 and one process per input
+            xml = '<prc:processes xmlns:prc="http://genologics.com/ri/process">'
+            for id in ['p0'] + params['inputartifactlimsid']:
+                xml += '<process uri="{url}/api/v2/processes/{id}" limsid="{id}"/>'.format(url=self.url, id=id)
+            return Mock(content=xml + '</prc:processes>', status_code=200)
+
+        with patch('requests.Session.get', side_effect=processes_xml) as mocked_get:
+            processes = lims.get_processes(inputartifactlimsid=ids, type='t1')
+            assert mocked_get.call_count > 1
+            for call in mocked_get.call_args_list:
+                assert call[1]['params']['type'] == 't1'
+                assert len(call[0][0]) + len(urlencode(call[1]['params'], doseq=True)) < 200
+        assert sorted(p.id for p in processes) == sorted(['p0'] + ids)
+        assert lims._split_params('u', {'type': ['a', 'b']}) == [{'type': ['a', 'b']}]
+
+    def test_iter_processes_split_streams_queries(self):
+        lims = Lims(self.url, username=self.username, password=self.password,
+                    max_url_length=200, max_workers=2)
+        ids = ['2-%s' % i for i in range(100)]
+
+        def processes_xml(uri, params, **kwargs):
+            xml = '<prc:processes xmlns:prc="http://genologics.com/ri/process">'
+            for id in params['inputartifactlimsid']:
+                xml += '<process uri="{url}/api/v2/processes/{id}" limsid="{id}"/>'.format(url=self.url, id=id)
+            return Mock(content=xml + '</prc:processes>', status_code=200)
+
+        with patch('requests.Session.get', side_effect=processes_xml) as mocked_get:
+            processes = lims.iter_processes(inputartifactlimsid=ids)
+            assert next(processes).id == '2-0'
+            assert mocked_get.call_count <= 3
+            assert [p.id for p in processes] == ids[1:]
+            assert mocked_get.call_count > 3
+
+    def test_get_qc_results(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        api = self.url + '/api/v2/'
+        maps = {'q1': ('2020-01-01', ['a1', 'a2']), 'q2': ('2020-02-01', ['a1'])}
+        processes_xml = '<prc:processes xmlns:prc="http://genologics.com/ri/process">' + ''.join(
+            '<process uri="{0}processes/{1}" limsid="{1}"/>'.format(api, id) for id in sorted(maps)) + '</prc:processes>'
+
+        def get(uri, **kwargs):
+            id = uri.split('/')[-1]
+            if id == 'processes':
+                return Mock(content=processes_xml, status_code=200)
+            date, inputs = maps[id]
+            xml = '<prc:process xmlns:prc="http://genologics.com/ri/process"><type>QC</type><date-run>%s</date-run>' % date
+            for input in inputs:
+                xml += ('<input-output-map><input uri="{0}artifacts/{1}" limsid="{1}"/>'
+                        '<output uri="{0}artifacts/{2}-{1}" limsid="{2}-{1}" output-type="ResultFile" '
+                        'output-generation-type="PerInput"/></input-output-map>').format(api, input, id)
+            return Mock(content=xml + '</prc:process>', status_code=200)
+
+        details_xml = '<art:details xmlns:art="http://genologics.com/ri/artifact">%s</art:details>' % ''.join(
+            '<art:artifact limsid="{0}" uri="{1}artifacts/{0}"/>'.format(id, api) for id in ['q2-a1', 'q1-a2'])
+        analytes = [Artifact(lims, id='a1'), Artifact(lims, id='a2')]
+        with patch('requests.Session.get', side_effect=get) as mocked_get, \
+                patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)) as mocked_post:
+            results = lims.get_qc_results(analytes, 'QC', resolve=True)
+            assert mocked_get.call_count == 3
+            assert mocked_post.call_count == 1
+            assert [r.id for r in results] == ['q2-a1', 'q1-a2']
+            assert all(r.root is not None for r in results)
+            assert [r.id for r in lims.get_qc_results_re(analytes, 'Q')] == ['q2-a1', 'q1-a2']
+            self.assertRaises(KeyError, lims.get_qc_results_re, analytes, 'X')
 
     def test_put(self):
         lims = Lims(self.url, username=self.username, password=self.password)
         uri = '{url}/api/v2/samples/test_sample'.format(url=self.url)
-        with patch('requests.put', return_value=Mock(content = self.sample_xml, status_code=200)) as mocked_put:
+        with patch('requests.Session.put', return_value=Mock(content = self.sample_xml, status_code=200)) as mocked_put:
             response = lims.put(uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
-        with patch('requests.put', return_value=Mock(content = self.error_xml, status_code=400)) as mocked_put:
+        with patch('requests.Session.put', return_value=Mock(content = self.error_xml, status_code=400)) as mocked_put:
             self.assertRaises(HTTPError, lims.put, uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
 
@@ -82,10 +225,10 @@ class TestLims(TestCase):
     def test_post(self):
         lims = Lims(self.url, username=self.username, password=self.password)
         uri = '{url}/api/v2/samples'.format(url=self.url)
-        with patch('requests.post', return_value=Mock(content = self.sample_xml, status_code=200)) as mocked_put:
+        with patch('requests.Session.post', return_value=Mock(content = self.sample_xml, status_code=200)) as mocked_put:
             response = lims.post(uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
-        with patch('requests.post', return_value=Mock(content = self.error_xml, status_code=400)) as mocked_put:
+        with patch('requests.Session.post', return_value=Mock(content = self.error_xml, status_code=400)) as mocked_put:
             self.assertRaises(HTTPError, lims.post, uri=uri, data=self.sample_xml)
             assert mocked_put.call_count == 1
 
@@ -103,7 +246,7 @@ class TestLims(TestCase):
         file_end = """</file:file>"""
         glsstorage_xml = '\n'.join([xml_intro,file_start, attached, upload, content_loc, file_end]).format(url=self.url)
         file_post_xml = '\n'.join([xml_intro, file_start2, attached, upload, content_loc, file_end]).format(url=self.url)
-        with patch('requests.post', side_effect=[Mock(content=glsstorage_xml, status_code=200),
+        with patch('requests.Session.post', side_effect=[Mock(content=glsstorage_xml, status_code=200),
                                                  Mock(content=file_post_xml, status_code=200),
                                                  Mock(content="", status_code=200)]):
 
@@ -111,21 +254,107 @@ class TestLims(TestCase):
                                         'filename_to_upload')
             assert file.id == "40-3501"
 
-        with patch('requests.post', side_effect=[Mock(content=self.error_xml, status_code=400)]):
+        with patch('requests.Session.post', side_effect=[Mock(content=self.error_xml, status_code=400)]):
 
           self.assertRaises(HTTPError,
                             lims.upload_new_file,
                             Mock(uri=self.url+"/api/v2/samples/test_sample"),
                             'filename_to_upload')
 
-    @patch('requests.post', return_value=Mock(content = sample_xml, status_code=200))
+    @patch('requests.Session.post', return_value=Mock(content = sample_xml, status_code=200))
     def test_route_artifact(self, mocked_post):
         lims = Lims(self.url, username=self.username, password=self.password)
         artifact = Mock(uri=self.url+"/artifact/2")
         lims.route_artifacts(artifact_list=[artifact], workflow_uri=self.url+'/api/v2/configuration/workflows/1')
         assert mocked_post.call_count == 1
 
+    def test_session_pool(self):
+        lims = Lims('https://testgenologics.com:4040', username=self.username, password=self.password,
+                    pool_maxsize=8)
+        assert lims.request_session.get_adapter('https://testgenologics.com') is lims.adapter
+        assert lims.adapter._pool_maxsize == 8
+        with patch('requests.Session.delete', return_value=Mock(status_code=204)) as mocked_delete:
+            lims.delete(lims.get_uri('samples', 's1'))
+            assert mocked_delete.call_args[1]['auth'] == ('test', 'password')
+
+
+
+    def test_get_batch_chunks(self):
+        lims = Lims(self.url, username=self.username, password=self.password, batch_size=2)
+        artifacts = [Artifact(lims, id='a%s' % i) for i in range(5)]
+
+        def batch_retrieve(uri, data, **kwargs):
+            ids = [link.attrib['uri'].split('/')[-1] for link in fromstring(data)]
+            details = ''.join('<art:artifact limsid="{0}" uri="{1}/api/v2/artifacts/{0}"><name>{0}</name></art:artifact>'
+                              .format(i, self.url) for i in ids)
+            return Mock(content='<art:details xmlns:art="http://genologics.com/ri/artifact">%s</art:details>' % details,
+                        status_code=200)
+
+        with patch('requests.Session.post', side_effect=batch_retrieve) as mocked_post:
+            result = lims.get_batch(artifacts)
+            assert mocked_post.call_count == 3
+            assert mocked_post.call_args[0][0] == '{url}/api/v2/artifacts/batch/retrieve'.format(url=self.url)
+        assert sorted(a.id for a in result) == ['a0', 'a1', 'a2', 'a3', 'a4']
+        assert all(a.root.find('name').text == a.id for a in artifacts)
+
+    def test_resolve_mixed_classes(self):
+        lims = Lims(self.url, username=self.username, password=self.password)
+        artifacts = [Artifact(lims, id='a%s' % i) for i in range(3)]
+        processes = [Process(lims, id='p%s' % i) for i in range(3)]
+        artifacts_xml = '<art:details xmlns:art="http://genologics.com/ri/artifact">%s</art:details>' % ''.join(
+            '<art:artifact limsid="a%s"/>' % i for i in range(3))
+        process_xml = '<prc:process xmlns:prc="http://genologics.com/ri/process"/>'
+        with patch('requests.Session.post', return_value=Mock(content=artifacts_xml, status_code=200)) as mocked_post:
+            with patch('requests.Session.get', return_value=Mock(content=process_xml, status_code=200)) as mocked_get:
+                result = lims.resolve(artifacts + processes + artifacts[:1])
+                assert mocked_post.call_count == 1
+                assert mocked_get.call_count == 3
+        assert result == artifacts + processes
+        assert all(i.root is not None for i in result)
+
+    def test_put_batch_reports_failed_items(self):
+        lims = Lims(self.url, username=self.username, password=self.password, batch_size=4)
+        artifacts = []
+        for i in range(6):
+            artifact = Artifact(lims, id='a%s' % i)
+            artifact.root = fromstring(
+                '<art:artifact xmlns:art="http://genologics.com/ri/artifact" limsid="a{0}"><name>a{0}</name></art:artifact>'.format(i))
+            artifacts.append(artifact)
+
+        def batch_update(uri, data, **kwargs):
+            if b'limsid="a1"' in data:
+                return Mock(content=self.error_xml, status_code=400)
+            return Mock(content='<art:links xmlns:art="http://genologics.com/ri/artifact"/>', status_code=200)
+
+        with patch('requests.Session.post', side_effect=batch_update):
+            result = lims.put_batch(artifacts, raise_on_error=False)
+        assert sorted(a.id for a in result.succeeded) == ['a0', 'a2', 'a3', 'a4', 'a5']
+        assert [(a.id, message) for a, message in result.failed] == [('a1', '400: Generic error message')]
+
+        with patch('requests.Session.post', side_effect=batch_update):
+            try:
+                lims.put_batch(artifacts)
+            except BatchUpdateError as e:
+                assert len(e.result.failed) == 1
+            else:
+                assert False, 'BatchUpdateError not raised'
 
+    def test_put_batch_does_not_split_other_errors(self):
+        lims = Lims(self.url, username=self.username, password=self.password, batch_size=4,
+                    retry_policy=RetryPolicy(retries=0))
+        artifacts = []
+        for i in range(10):
+            artifact = Artifact(lims, id='a%s' % i)
+            artifact.root = fromstring(
+                '<art:artifact xmlns:art="http://genologics.com/ri/artifact" limsid="a{0}"/>'.format(i))
+            artifacts.append(artifact)
+        for status in (401, 503):
+            with patch('requests.Session.post', return_value=Mock(content=self.error_xml, status_code=status)) as mocked_post:
+                result = lims.put_batch(artifacts, raise_on_error=False)
+                assert mocked_post.call_count == 3
+            assert result.succeeded == []
+            assert len(result.failed) == 10
+            assert result.failed[0][1] == '%s: Generic error message' % status
 
     def test_tostring(self):
         lims = Lims(self.url, username=self.username, password=self.password)
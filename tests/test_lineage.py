@@ -0,0 +1,151 @@
+import os
+import shutil
+import tempfile
+from sys import version_info
+from unittest import TestCase
+
+from genologics.entities import Artifact, Process, SampleHistory
+from genologics.lims import Lims
+from genologics.lineage import LineageGraph, ProcessIndex
+
+if version_info[0] == 2:
+    from mock import patch, Mock
+else:
+    from unittest.mock import patch, Mock
+
+url = 'http://testgenologics.com:4040'
+api = url + '/api/v2/'
+
+artifacts_xml = """<art:artifacts xmlns:art="http://genologics.com/ri/artifact">
+<artifact limsid="a0" uri="{api}artifacts/a0"/>
+<artifact limsid="a1" uri="{api}artifacts/a1"/>
+<artifact limsid="a2" uri="{api}artifacts/a2"/>
+</art:artifacts>""".format(api=api)
+
+details_xml = """<art:details xmlns:art="http://genologics.com/ri/artifact">
+<art:artifact limsid="a0" uri="{api}artifacts/a0"><type>Analyte</type></art:artifact>
+<art:artifact limsid="a1" uri="{api}artifacts/a1"><type>Analyte</type><parent-process limsid="p1" uri="{api}processes/p1"/></art:artifact>
+<art:artifact limsid="a2" uri="{api}artifacts/a2"><type>Analyte</type><parent-process limsid="p2" uri="{api}processes/p2"/></art:artifact>
+</art:details>""".format(api=api)
+
+process_xml = """<prc:process xmlns:prc="http://genologics.com/ri/process" limsid="{id}" uri="{api}processes/{id}">
+<type uri="{api}processtypes/{type}">{type}</type>
+<date-run>2020-01-0{day}</date-run>
+<input-output-map>
+<input limsid="{input}" uri="{api}artifacts/{input}"/>
+<output limsid="{output}" uri="{api}artifacts/{output}" output-type="{output_type}" output-generation-type="PerInput"/>
+</input-output-map>
+</prc:process>"""
+
+processes = {
+    'p1': dict(type='t1', day=1, input='a0', output='a1', output_type='Analyte'),
+    'p2': dict(type='t2', day=2, input='a1', output='a2', output_type='Analyte'),
+    'q1': dict(type='t3', day=3, input='a1', output='r1', output_type='ResultFile'),
+}
+
+processes_xml = """<prc:processes xmlns:prc="http://genologics.com/ri/process">
+<process limsid="p1" uri="{api}processes/p1"/>
+<process limsid="p2" uri="{api}processes/p2"/>
+<process limsid="q1" uri="{api}processes/q1"/>
+</prc:processes>""".format(api=api)
+
+processtype_xml = """<ptp:process-type xmlns:ptp="http://genologics.com/ri/processtype" name="{id} name" uri="{api}processtypes/{id}"/>"""
+
+
+def fake_get(uri, params=None, **kwargs):
+    path = uri[len(api):]
+    if path == 'artifacts':
+        content = artifacts_xml
+    elif path == 'processes':
+        content = processes_xml
+    elif path.startswith('processes/'):
+        id = path.split('/')[-1]
+        content = process_xml.format(api=api, id=id, **processes[id])
+    elif path.startswith('processtypes/'):
+        content = processtype_xml.format(api=api, id=path.split('/')[-1])
+    else:
+        raise AssertionError(uri)
+    return Mock(content=content, status_code=200)
+
+
+class TestLineageGraph(TestCase):
+
+    def setUp(self):
+        self.lims = Lims(url, username='test', password='password')
+
+    def test_graph(self):
+        artifacts = [Artifact(self.lims, id=id) for id in ('a0', 'a1', 'a2')]
+        with patch('requests.Session.get', side_effect=fake_get) as mocked_get, \
+                patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)) as mocked_post:
+            graph = LineageGraph(self.lims, artifacts)
+            assert mocked_post.call_count == 1
+            assert graph.parent_process('a2') == Process(self.lims, id='p2')
+            assert graph.parent_process('a0') is None
+            assert graph.inputs('a2') == ['a1']
+            assert graph.ancestors('a2') == ['a1', 'a0']
+            consumers = graph.consumers(['a1', 'a0'])
+            assert [p.id for p in consumers['a1']] == ['p2', 'q1']
+            assert [p.id for p in consumers['a0']] == ['p1']
+            calls = mocked_get.call_count
+            graph.consumers(['a1'])
+            assert mocked_get.call_count == calls
+
+    def test_sample_history(self):
+        with patch('requests.Session.get', side_effect=fake_get) as mocked_get, \
+                patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)):
+            history = SampleHistory(sample_name='s1', output_artifact='a2', lims=self.lims)
+            process_queries = [c for c in mocked_get.call_args_list if c[0][0] == api + 'processes']
+            assert len(process_queries) == 1
+        assert history.history_list == ['a1', 'a0']
+        assert history.history['a1']['p2']['outart'] == 'a2'
+        assert history.history['a1']['q1']['outart'] is None
+        assert history.history['a1']['q1']['name'] == 't3 name'
+        assert history.history['a0']['p1'] == {'date': '2020-01-01', 'id': 'p1', 'outart': 'a1',
+                                               'inart': 'a0', 'type': 't1', 'name': 't1 name'}
+
+    def test_sample_history_input(self):
+        with patch('requests.Session.get', side_effect=fake_get), \
+                patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)):
+            history = SampleHistory(sample_name='s1', output_artifact='r1', input_artifact='a1', lims=self.lims)
+        assert history.history_list == ['a1', 'a0']
+        assert history.history['a1']['q1']['outart'] == 'r1'
+        assert history.history['a1']['p2']['outart'] is None
+        assert history.history['a0']['p1']['outart'] == 'a1'
+
+
+class TestProcessIndex(TestCase):
+
+    def setUp(self):
+        self.lims = Lims(url, username='test', password='password')
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_for_artifacts(self):
+        with patch('requests.Session.get', side_effect=fake_get) as mocked_get:
+            index = ProcessIndex.for_artifacts(self.lims, ['a0', 'a1', 'a2', 'a1'])
+            assert mocked_get.call_args_list[0][1]['params'] == {'inputartifactlimsid': ['a0', 'a1', 'a2']}
+        assert index.index == {'a0': ['p1'], 'a1': ['p2', 'q1'], 'a2': []}
+        assert index['a1'] == [Process(self.lims, id='p2'), Process(self.lims, id='q1')]
+        assert 'r1' not in index
+        assert index.get('r1') is None
+
+    def test_save_load(self):
+        filename = os.path.join(self.tmpdir, 'index.json')
+        ProcessIndex(self.lims, {'a1': ['p2', 'q1']}).save(filename)
+        index = ProcessIndex.load(self.lims, filename)
+        assert index.index == {'a1': ['p2', 'q1']}
+        other = Lims('http://other.com', username='test', password='password')
+        self.assertRaises(ValueError, ProcessIndex.load, other, filename)
+
+    def test_sample_history(self):
+        with patch('requests.Session.get', side_effect=fake_get) as mocked_get, \
+                patch('requests.Session.post', return_value=Mock(content=details_xml, status_code=200)):
+            index = ProcessIndex.for_project(self.lims, 'project1')
+            calls = mocked_get.call_count
+            history = SampleHistory(sample_name='s1', output_artifact='a2', lims=self.lims, pro_per_art=index)
+            uris = [c[0][0] for c in mocked_get.call_args_list[calls:]]
+            assert api + 'processes' not in uris
+        assert history.history['a1']['p2']['outart'] == 'a2'
+        assert history.history['a0']['p1']['outart'] == 'a1'
@@ -0,0 +1,160 @@
+import time
+from io import BytesIO
+from sys import version_info
+from unittest import TestCase
+
+import requests
+from requests.exceptions import HTTPError, Timeout
+
+from genologics.lims import Lims, Process
+from genologics.transport import RetryPolicy, Limit, RequestGovernor
+
+if version_info[0] == 2:
+    from mock import patch, Mock
+else:
+    from unittest.mock import patch, Mock
+
+url = 'http://testgenologics.com:4040'
+
+process_xml = '<prc:process xmlns:prc="http://genologics.com/ri/process"/>'
+
+
+class TestRetryPolicy(TestCase):
+
+    def test_retried_failures(self):
+        policy = RetryPolicy(retries=2)
+        assert policy.retry(0, response=Mock(status_code=503))
+        assert not policy.retry(0, response=Mock(status_code=500))
+        assert policy.retry(1, exception=Timeout())
+        assert not policy.retry(1, exception=ValueError())
+        assert not policy.retry(2, response=Mock(status_code=503))
+
+    def test_budget(self):
+        policy = RetryPolicy(budget_ratio=0.5, budget_min=1)
+        policy.request_sent()
+        policy.request_sent()
+        assert policy.retry(0, response=Mock(status_code=502))
+        assert policy.retry(0, response=Mock(status_code=502))
+        assert not policy.retry(0, response=Mock(status_code=502))
+        assert policy.stats == dict(requests=2, retries=2)
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        assert all(0 <= policy.delay(3) <= 5 for _ in range(20))
+        assert policy.delay(0, Mock(headers={'retry-after': '3'})) == 3
+
+
+@patch('time.sleep')
+class TestLimsRetry(TestCase):
+
+    def setUp(self):
+        self.lims = Lims(url, username='test', password='password')
+
+    def test_get_retried(self, mocked_sleep):
+        with patch('requests.Session.get', side_effect=[Mock(status_code=503, content=''),
+                                                        requests.exceptions.ConnectionError(),
+                                                        Mock(status_code=200, content=process_xml)]) as mocked_get:
+            self.lims.get(self.lims.get_uri('processes', 'p1'))
+            assert mocked_get.call_count == 3
+            assert mocked_sleep.call_count == 2
+
+    def test_timeout_reraised(self, mocked_sleep):
+        self.lims.retry_policy = RetryPolicy(retries=1)
+        with patch('requests.Session.get', side_effect=Timeout('read timeout')) as mocked_get:
+            self.assertRaises(Timeout, self.lims.get, self.lims.get_uri('processes', 'p1'))
+            assert mocked_get.call_count == 2
+
+    def test_post_retried_on_request(self, mocked_sleep):
+        uri = self.lims.get_uri('processes')
+        with patch('requests.Session.post', return_value=Mock(status_code=503, content='')) as mocked_post:
+            self.assertRaises(HTTPError, self.lims.post, uri, process_xml)
+            assert mocked_post.call_count == 1
+        with patch('requests.Session.post', side_effect=[Mock(status_code=503, content=''),
+                                                         Mock(status_code=201, content=process_xml)]) as mocked_post:
+            self.lims.post(uri, process_xml, retry=True)
+            assert mocked_post.call_count == 2
+
+
+class TestRequestGovernor(TestCase):
+
+    def test_matching_limits(self):
+        batch = Limit('artifacts/batch/*', methods=['post'])
+        processes = Limit('processes*')
+        governor = RequestGovernor([batch, processes])
+        with governor.slot('post', url + '/api/v2/artifacts/batch/retrieve'):
+            pass
+        with governor.slot('get', url + '/api/v2/processes?type=QC'):
+            pass
+        with governor.slot('get', url + '/api/v2/artifacts/batch/retrieve'):
+            pass
+        assert batch.stats['requests'] == 1
+        assert processes.stats['requests'] == 1
+
+    def test_rate(self):
+        limit = Limit(rate=10, burst=2)
+        with patch('time.sleep') as mocked_sleep:
+            limit.acquire()
+            limit.acquire()
+            assert mocked_sleep.call_count == 0
+            limit.acquire()
+            assert mocked_sleep.call_count == 1
+            assert 0.05 < mocked_sleep.call_args[0][0] <= 0.1
+
+    def test_max_in_flight(self):
+        lims = Lims(url, username='test', password='password', max_workers=4,
+                    limits=[Limit('processes/*', max_in_flight=1)])
+        in_flight = []
+
+        def get(uri, **kwargs):
+            in_flight.append(uri)
+            assert len(in_flight) == 1
+            time.sleep(0.01)
+            in_flight.remove(uri)
+            return Mock(status_code=200, content=process_xml)
+
+        with patch('requests.Session.get', side_effect=get):
+            lims.resolve([Process(lims, id='p%s' % i) for i in range(4)])
+        assert lims.governor.limits[0].stats['requests'] == 4
+        assert lims.governor.stats['wait_time'] > 0
+
+    def test_streamed_body_holds_slot(self):
+        limit = Limit(max_in_flight=1)
+        lims = Lims(url, username='test', password='password', limits=[limit])
+        held = []
+
+        class Body(BytesIO):
+            def read(self, *args, **kwargs):
+                held.append(not limit._semaphore.acquire(False))
+                return BytesIO.read(self, *args, **kwargs)
+
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = Body(process_xml.encode('utf-8'))
+        with patch('requests.Session.get', return_value=response):
+            lims.get(url + '/api/v2/processes/p1')
+        assert held and all(held)
+        assert limit._semaphore.acquire(False)
+
+    def test_public_streamed_request_releases_slot(self):
+        limit = Limit(max_in_flight=1)
+        lims = Lims(url, username='test', password='password', limits=[limit])
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = BytesIO(process_xml.encode('utf-8'))
+        with patch('requests.Session.get', return_value=response) as mocked_get:
+            r = lims.request('get', url + '/api/v2/processes/p1', stream=True)
+            r.close()
+            assert '_hold_limits' not in mocked_get.call_args[1]
+        assert limit._semaphore.acquire(False)
+
+    def test_not_modified_releases_slot(self):
+        limit = Limit(max_in_flight=1)
+        lims = Lims(url, username='test', password='password', limits=[limit])
+        response = requests.Response()
+        response.status_code = 304
+        response.raw = BytesIO(b'')
+        with patch('requests.Session.get', return_value=response):
+            root, validators = lims.get_validated(url + '/api/v2/processes/p1', dict(etag='"1"'))
+        assert root is None
+        assert response.raw.closed
+        assert limit._semaphore.acquire(False)